@@ -1,7 +1,28 @@
 # agents/__init__.py
 
-from .router_agent import router_agent
+import importlib
 
-from .user_agent import user_agent
+# Agents are loaded lazily: each one pulls in swarm, requests and pymongo, so
+# importing the package (e.g. for agents.fast_router) must not import them.
+# Accessors are used instead of package attributes because the attribute
+# names would collide with the submodules that define the agents.
+_AGENT_MODULES = {
+    'router_agent': '.router_agent',
+    'user_agent': '.user_agent',
+    'weather_agent': '.weather_agent',
+}
 
-from .weather_agent import weather_agent
+def get_agent(name):
+    module_name = _AGENT_MODULES.get(name)
+    if module_name is None:
+        raise ValueError(f"Unknown agent: {name!r}")
+    return getattr(importlib.import_module(module_name, __name__), name)
+
+def get_router_agent():
+    return get_agent('router_agent')
+
+def get_user_agent():
+    return get_agent('user_agent')
+
+def get_weather_agent():
+    return get_agent('weather_agent')
@@ -0,0 +1,288 @@
+# agents/city_gazetteer.py
+
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from utils.db_utils import get_db, normalize_city_name
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Resolves what users type ("nyc", "sao paulo") to a known city id, so
+# lookups become exact id/name_key reads and the API is queried by id.
+# Known cities come from weather_data; other names go to the API as a query,
+# and only if it finds nothing are they spelling-corrected ("londn").
+GAZETTEER_RELOAD_SECONDS = float(os.getenv('GAZETTEER_RELOAD_SECONDS', '3600'))
+FUZZY_THRESHOLD = float(os.getenv('GAZETTEER_FUZZY_THRESHOLD', '0.6'))
+# Names scored per fuzzy lookup; keys made only of very common trigrams give up
+FUZZY_MAX_CANDIDATES = int(os.getenv('GAZETTEER_FUZZY_MAX_CANDIDATES', '500'))
+MIN_PREFIX_LENGTH = 4
+
+CityEntry = namedtuple('CityEntry', ['id', 'name', 'name_key', 'country'])
+# entry is None when the city is unknown; query is the canonical name to ask the API for
+Resolution = namedtuple('Resolution', ['entry', 'query', 'method'])
+
+# Whole-name variants, keyed and valued in folded form
+CITY_ALIASES = {
+    'nyc': 'new york',
+    'new york city': 'new york',
+    'ny': 'new york',
+    'la': 'los angeles',
+    'sf': 'san francisco',
+    'san fran': 'san francisco',
+    'dc': 'washington',
+    'washington dc': 'washington',
+    'philly': 'philadelphia',
+    'vegas': 'las vegas',
+    'rio': 'rio de janeiro',
+    'cdmx': 'mexico city',
+    'ciudad de mexico': 'mexico city',
+    'bombay': 'mumbai',
+    'calcutta': 'kolkata',
+    'madras': 'chennai',
+    'peking': 'beijing',
+    'saigon': 'ho chi minh city',
+    'kiev': 'kyiv',
+    'leningrad': 'saint petersburg',
+    'munchen': 'munich',
+    'koln': 'cologne',
+    'firenze': 'florence',
+    'roma': 'rome',
+    'milano': 'milan',
+    'napoli': 'naples',
+    'lisboa': 'lisbon',
+    'praha': 'prague',
+    'wien': 'vienna',
+    'bruxelles': 'brussels',
+    'den haag': 'the hague',
+    'kobenhavn': 'copenhagen',
+}
+
+# Per-word abbreviations, expanded before matching
+TOKEN_ALIASES = {'st': 'saint', 'ste': 'sainte', 'ft': 'fort', 'mt': 'mount'}
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_COUNTRY_SUFFIX = re.compile(r'^(?P<name>.+?),\s*(?P<country>[a-z]{2})$')
+
+def fold_city_name(name):
+    # Accents, case, punctuation and abbreviations never distinguish cities
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    tokens = _NON_ALNUM.sub(' ', ascii_name.lower()).split()
+    return ' '.join(TOKEN_ALIASES.get(token, token) for token in tokens)
+
+def edit_distance(a, b):
+    # Optimal string alignment: insertions, deletions, substitutions and swaps
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+def trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class _TrieNode:
+    __slots__ = ('children', 'keys')
+
+    def __init__(self):
+        self.children = {}
+        self.keys = []
+
+class CityGazetteer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # folded name -> [CityEntry], first added first
+        self._by_id = {}
+        self._root = _TrieNode()
+        self._grams = {}  # trigram -> set of folded names
+        self._learned = {}  # folded query -> id of the city the API answered it with
+        self.loaded_at = 0.0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def add(self, city_id, name, country=None):
+        if city_id is None or not name or city_id in self._by_id:
+            return
+        key = fold_city_name(name)
+        if not key:
+            return
+        entry = CityEntry(city_id, name, normalize_city_name(name), country)
+        with self._lock:
+            self._by_id[city_id] = entry
+            entries = self._entries.get(key)
+            if entries is not None:
+                entries.append(entry)
+                return
+            self._entries[key] = [entry]
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+            node.keys.append(key)
+            for gram in trigrams(key):
+                self._grams.setdefault(gram, set()).add(key)
+
+    def add_document(self, document):
+        self.add(document.get('id'), document.get('name'), (document.get('sys') or {}).get('country'))
+
+    def load(self, collection=None):
+        collection = collection if collection is not None else get_db()['weather_data']
+        start = time.perf_counter()
+        cursor = collection.find({'id': {'$ne': None}}, {'_id': 0, 'id': 1, 'name': 1, 'sys.country': 1})
+        for document in cursor:
+            self.add_document(document)
+        self.loaded_at = time.monotonic()
+        logger.debug("Loaded %s cities into the gazetteer in %.3fs.", len(self), time.perf_counter() - start)
+
+    def complete(self, prefix, limit=5):
+        # Folded names starting with prefix, shortest first
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        found, stack = [], [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            found.extend(node.keys)
+            stack.extend(node.children.values())
+        return sorted(found, key=len)[:limit]
+
+    def fuzzy(self, key, threshold=FUZZY_THRESHOLD):
+        # Best Dice similarity over padded trigrams. A name scoring at least
+        # threshold shares at least `needed` trigrams with the key, so it must
+        # appear in one of the len(grams) - needed + 1 rarest ones: only their
+        # postings are scanned, never those of common grams like "  s".
+        grams = trigrams(key)
+        needed = math.ceil(threshold * len(grams) / (2 - threshold))
+        postings = sorted((self._grams.get(gram, ()) for gram in grams), key=len)
+        candidates = set()
+        for posting in postings[:len(grams) - needed + 1]:
+            if len(candidates) + len(posting) > FUZZY_MAX_CANDIDATES:
+                break
+            candidates.update(posting)
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            # Substring tests are far cheaper than building each candidate's trigram set
+            padded = f'  {candidate} '
+            shared = sum(gram in padded for gram in grams)
+            score = 2 * shared / (len(grams) + len(padded) - 2)
+            if score > best_score or (score == best_score and candidate < best):
+                best, best_score = candidate, score
+        return (best, best_score) if best_score >= threshold else (None, best_score)
+
+    def _pick(self, key, country):
+        entries = self._entries.get(key, ())
+        if not country:
+            return entries[0] if entries else None
+        # A city of the same name elsewhere is not the one asked for
+        for entry in entries:
+            if (entry.country or '').lower() == country:
+                return entry
+        return None
+
+    def _parse(self, text):
+        match = _COUNTRY_SUFFIX.match(normalize_city_name(text))
+        if match:
+            return fold_city_name(match.group('name')), match.group('country')
+        return fold_city_name(text), None
+
+    def resolve(self, text):
+        # Only exact names and aliases identify a city: anything looser can turn
+        # a real city the API knows ("perth amboy", "romeo") into a different one
+        key, country = self._parse(text)
+        key = CITY_ALIASES.get(key, key)
+        if not key:
+            return Resolution(None, text, None)
+        query = f'{key},{country}' if country else key
+        learned = self._by_id.get(self._learned.get(fold_city_name(query)))
+        if learned is not None:
+            return Resolution(learned, query, 'learned')
+        entry = self._pick(key, country)
+        if entry is not None:
+            return Resolution(entry, query, 'exact')
+        return Resolution(None, query, None)
+
+    def correct(self, text):
+        # Spelling correction for names the API did not find: a unique prefix,
+        # or a close trigram match with as many words as what was typed and a
+        # single typo ("londn", but not "valence" -> "valencia")
+        key, country = self._parse(text)
+        if not key:
+            return Resolution(None, text, None)
+        words = key.count(' ')
+        if len(key) >= MIN_PREFIX_LENGTH:
+            completions = self.complete(key, limit=2)
+            # A prefix must be unambiguous and cover most of the name it completes
+            if (len(completions) == 1 and 2 * len(key) > len(completions[0])
+                    and completions[0].count(' ') == words):
+                entry = self._pick(completions[0], country)
+                if entry is not None:
+                    return Resolution(entry, completions[0], 'prefix')
+        candidate, _ = self.fuzzy(key)
+        if (candidate is not None and candidate.count(' ') == words
+                and edit_distance(key, candidate) <= 1):
+            entry = self._pick(candidate, country)
+            if entry is not None:
+                return Resolution(entry, candidate, 'fuzzy')
+        return Resolution(None, key, None)
+
+    def learn(self, query, city_id):
+        # The API answered query with this city, so later lookups go by id
+        if city_id in self._by_id:
+            self._learned[fold_city_name(query)] = city_id
+
+    def stale(self):
+        return time.monotonic() - self.loaded_at >= GAZETTEER_RELOAD_SECONDS
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+_reload_lock = threading.Lock()
+
+def _reload():
+    global _gazetteer
+    try:
+        gazetteer = CityGazetteer()
+        gazetteer.load()
+        _gazetteer = gazetteer
+    except Exception as e:
+        logger.error("Failed to reload the city gazetteer: %s", e)
+        # Keep serving the old one; try again after another interval
+        _gazetteer.loaded_at = time.monotonic()
+    finally:
+        _reload_lock.release()
+
+def get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                gazetteer = CityGazetteer()
+                gazetteer.load()
+                _gazetteer = gazetteer
+    elif _gazetteer.stale() and _reload_lock.acquire(blocking=False):
+        # Requests keep resolving against the current one while it reloads
+        threading.Thread(target=_reload, name='gazetteer-reload', daemon=True).start()
+    return _gazetteer
+
+def loaded_gazetteer():
+    # None until the first load, which blocks; callers on an event loop use this
+    return _gazetteer
+
+def remember_cities(documents):
+    # Write-through for stored weather documents; never triggers a load
+    gazetteer = _gazetteer
+    if gazetteer is not None:
+        for document in documents:
+            gazetteer.add_document(document)
+
+def resolve_city(city_name):
+    return get_gazetteer().resolve(city_name)
@@ -0,0 +1,94 @@
+# agents/direct_response.py
+
+import os
+import threading
+import time
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from swarm import Swarm
+from swarm.types import Response, Result
+from utils.instrumentation import observe_span
+from utils.weather_client import LatencyStats
+
+FINAL_RESPONSE_KEY = '__final_response__'
+
+# Intents whose tool output is already the user-facing answer
+DIRECT_RESPONSE_INTENTS = frozenset(
+    intent.strip() for intent in os.getenv(
+        'DIRECT_RESPONSE_INTENTS',
+        'list_cities,hottest_cities,coldest_cities,hottest,average_temperature,average_by_country,'
+        'temperature_percentiles,temperature_history,average_humidity,humidity,users,top_articles,category_affinity,'
+        'feed_popularity,recommendations',
+    ).split(',') if intent.strip()
+)
+
+def is_direct_intent(intent):
+    return intent in DIRECT_RESPONSE_INTENTS
+
+def final_response(value):
+    return Result(value=str(value), context_variables={FINAL_RESPONSE_KEY: True})
+
+def _direct_completion(content):
+    message = ChatCompletionMessage(role='assistant', content=content)
+    return ChatCompletion(
+        id='direct-response',
+        choices=[Choice(finish_reason='stop', index=0, message=message)],
+        created=int(time.time()),
+        model='direct-response',
+        object='chat.completion',
+    )
+
+class DirectResponseSwarm(Swarm):
+    def __init__(self, client=None):
+        super().__init__(client)
+        self.latency = {'direct': LatencyStats(), 'model': LatencyStats()}
+        self._turn = threading.local()
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables, debug):
+        # One call at a time, to record which tool calls returned final_response();
+        # the flag then holds their ids instead of True
+        response = Response(messages=[], agent=None, context_variables={})
+        final_ids = []
+        for tool_call in tool_calls:
+            partial = super().handle_tool_calls([tool_call], functions, context_variables, debug)
+            if partial.context_variables.pop(FINAL_RESPONSE_KEY, False):
+                final_ids.append(tool_call.id)
+            response.messages.extend(partial.messages)
+            response.context_variables.update(partial.context_variables)
+            if partial.agent:
+                response.agent = partial.agent
+        if final_ids:
+            response.context_variables[FINAL_RESPONSE_KEY] = final_ids
+        return response
+
+    def get_chat_completion(self, agent, history, context_variables, model_override, stream, debug):
+        # The flag is popped so it never leaks into the next completion or turn
+        final_ids = context_variables.pop(FINAL_RESPONSE_KEY, None)
+        if final_ids and not stream and history and history[-1].get('role') == 'tool':
+            # Only the flagged calls' outputs form the answer, not other tools run in the same turn
+            tool_messages = []
+            for message in reversed(history):
+                if message.get('role') != 'tool':
+                    break
+                if message.get('tool_call_id') in final_ids:
+                    tool_messages.append(message['content'])
+            if tool_messages:
+                self._turn.direct = True
+                return _direct_completion('\n'.join(reversed(tool_messages)))
+        return super().get_chat_completion(agent, history, context_variables, model_override, stream, debug)
+
+    def run(self, agent, messages, context_variables={}, model_override=None, stream=False,
+            debug=False, max_turns=float("inf"), execute_tools=True):
+        self._turn.direct = False
+        start = time.perf_counter()
+        response = super().run(agent, messages, context_variables, model_override, stream,
+                               debug, max_turns, execute_tools)
+        if not stream:
+            path = 'direct' if self._turn.direct else 'model'
+            elapsed = time.perf_counter() - start
+            self.latency[path].record(elapsed)
+            observe_span('turn', path, elapsed)
+        return response
+
+    def turn_metrics(self):
+        return {path: stats.snapshot() for path, stats in self.latency.items()}
@@ -0,0 +1,62 @@
+# agents/fast_router.py
+
+import os
+import re
+import sys
+from collections import namedtuple
+from agents import get_agent
+from agents.rss_intents import match_rss_intent
+from agents.weather_intents import match_intent
+
+FAST_ROUTE_THRESHOLD = float(os.getenv('FAST_ROUTE_THRESHOLD', '0.8'))
+
+# Their patterns take any "update/delete <words>", so they only route to the
+# weather agent for a known city or a weather word ("remove my account" does not)
+CATCH_ALL_INTENTS = frozenset(('update_city', 'delete_city'))
+CATCH_ALL_CONFIDENCE = 0.5
+
+# Same vocabulary the agents themselves key on
+USER_PATTERN = re.compile(r"\busers?\b")
+WEATHER_PATTERN = re.compile(
+    r"\b(?:weather|forecast|temperature|temp|humidity|visibility|"
+    r"hottest|warmest|coldest|coolest|cities|city)\b"
+)
+
+Route = namedtuple('Route', ['agent', 'confidence', 'intent'])
+
+def is_known_city(city_name):
+    # Only consults a gazetteer something else already loaded; never loads one
+    if not city_name or 'agents.city_gazetteer' not in sys.modules:
+        return False
+    gazetteer = sys.modules['agents.city_gazetteer'].loaded_gazetteer()
+    return gazetteer is not None and gazetteer.resolve(city_name).entry is not None
+
+def classify_message(message):
+    user_request = message.lower().strip()
+    mentions_users = USER_PATTERN.search(user_request) is not None
+    mentions_weather = WEATHER_PATTERN.search(user_request) is not None
+    intent, city_name = match_intent(user_request)
+    if intent and not mentions_users:
+        if intent not in CATCH_ALL_INTENTS or mentions_weather or is_known_city(city_name):
+            return Route('weather_agent', 1.0, intent)
+    # Feed, article and category analytics live on the user agent
+    rss_intent = match_rss_intent(user_request)
+    if rss_intent:
+        return Route('user_agent', 1.0, rss_intent)
+    if mentions_users and not mentions_weather:
+        return Route('user_agent', 0.9, 'users')
+    if mentions_weather and not mentions_users:
+        return Route('weather_agent', 0.9, None)
+    if intent and not mentions_users:
+        return Route('weather_agent', CATCH_ALL_CONFIDENCE, intent)
+    return Route(None, 0.0, None)
+
+def route_agent(route):
+    # Route.agent is a key of agents.get_agent, or None when nothing matched
+    return get_agent(route.agent) if route.agent is not None else None
+
+def route_message(message, threshold=FAST_ROUTE_THRESHOLD):
+    route = classify_message(message)
+    if route.confidence < threshold:
+        return None
+    return route_agent(route)
@@ -1,14 +1,12 @@
 # agents/router_agent.py
 
 from swarm import Agent
-from agents.weather_agent import weather_agent
-# ... import other agents ...
+from agents.fast_router import classify_message, route_agent
 
 def router_process(message):
-    user_request = message.lower()
-    if "weather" in user_request:
-        return weather_agent
-    # ... handle other cases ...
+    agent = route_agent(classify_message(message))
+    if agent is not None:
+        return agent
     else:
         return "I'm sorry, I couldn't find an agent to assist with your request."
 
@@ -18,4 +16,3 @@ router_agent = Agent(
 determine which agent is best suited to handle the user's request, and transfer the conversation to that agent.""",
     functions=[router_process]
 )
-
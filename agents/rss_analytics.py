@@ -0,0 +1,160 @@
+# agents/rss_analytics.py
+
+from agents.rss_intents import (
+    INTERACTION_TYPE_PATTERN,
+    INTERACTION_TYPES,
+    INTERACTION_VERBS,
+    USER_PATTERN,
+    match_rss_intent,
+    parse_limit,
+    parse_window,
+)
+from utils.db_utils import get_analytics_db
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Relative weight of each interaction when scoring category affinity; an
+# explicit category preference counts as much as a share
+INTERACTION_WEIGHTS = {'view': 1, 'like': 3, 'share': 5}
+PREFERENCE_WEIGHT = 5
+
+def interaction_weight_expression(field='$interaction_type'):
+    branches = [{'case': {'$eq': [field, interaction_type]}, 'then': weight}
+                for interaction_type, weight in INTERACTION_WEIGHTS.items()]
+    return {'$switch': {'branches': branches, 'default': 1}}
+
+def _time_range(field, since=None, until=None):
+    bounds = {}
+    if since:
+        bounds['$gte'] = since
+    if until:
+        bounds['$lt'] = until
+    return {field: bounds} if bounds else {}
+
+def top_articles(interaction_type='view', since=None, until=None, limit=10):
+    # Served by the (interaction_type, interaction_time) index; only the top
+    # rss_item_ids reach the $lookup into rss_items
+    pipeline = [
+        {'$match': {'interaction_type': interaction_type, **_time_range('interaction_time', since, until)}},
+        {'$group': {'_id': '$rss_item_id', 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1, '_id': 1}},
+        {'$limit': limit},
+        {'$lookup': {'from': 'rss_items', 'localField': '_id', 'foreignField': '_id', 'as': 'item'}},
+        {'$unwind': {'path': '$item', 'preserveNullAndEmptyArrays': True}},
+        {'$project': {'count': 1, 'title': '$item.title', 'link': '$item.link'}},
+    ]
+    return list(get_analytics_db()['article_interactions'].aggregate(pipeline, allowDiskUse=True))
+
+def category_affinity(user_id, since=None, limit=5):
+    # Weighted interactions per category (via rss_item_categories), plus the
+    # user's explicit preferences, summed into one score per category
+    pipeline = [
+        {'$match': {'user_id': user_id, **_time_range('interaction_time', since)}},
+        {'$group': {
+            '_id': '$rss_item_id',
+            'score': {'$sum': interaction_weight_expression()},
+            'interactions': {'$sum': 1},
+        }},
+        {'$lookup': {'from': 'rss_item_categories', 'localField': '_id', 'foreignField': 'rss_item_id',
+                     'as': 'categories'}},
+        {'$unwind': '$categories'},
+        {'$project': {'_id': 0, 'category_id': '$categories.category_id', 'score': 1,
+                      'interactions': 1, 'preferred': {'$literal': False}}},
+        {'$unionWith': {'coll': 'user_category_preferences', 'pipeline': [
+            {'$match': {'user_id': user_id}},
+            {'$project': {'_id': 0, 'category_id': 1, 'score': {'$literal': PREFERENCE_WEIGHT},
+                          'interactions': {'$literal': 0}, 'preferred': {'$literal': True}}},
+        ]}},
+        {'$group': {
+            '_id': '$category_id',
+            'score': {'$sum': '$score'},
+            'interactions': {'$sum': '$interactions'},
+            'preferred': {'$max': '$preferred'},
+        }},
+        {'$sort': {'score': -1, '_id': 1}},
+        {'$limit': limit},
+        {'$lookup': {'from': 'categories', 'localField': '_id', 'foreignField': '_id', 'as': 'category'}},
+        {'$unwind': {'path': '$category', 'preserveNullAndEmptyArrays': True}},
+        {'$project': {'score': 1, 'interactions': 1, 'preferred': 1, 'name': '$category.name'}},
+    ]
+    return list(get_analytics_db()['article_interactions'].aggregate(pipeline, allowDiskUse=True))
+
+def feed_popularity(since=None, until=None, limit=10):
+    # Grouping by (feed, user) first counts unique viewers without building
+    # an unbounded $addToSet array per feed
+    pipeline = [
+        {'$match': _time_range('viewed_at', since, until)},
+        {'$group': {'_id': {'feed': '$rss_feed_id', 'user': '$user_id'}, 'views': {'$sum': 1}}},
+        {'$group': {'_id': '$_id.feed', 'views': {'$sum': '$views'}, 'viewers': {'$sum': 1}}},
+        {'$sort': {'views': -1, '_id': 1}},
+        {'$limit': limit},
+        {'$lookup': {'from': 'rss_feeds', 'localField': '_id', 'foreignField': '_id', 'as': 'feed'}},
+        {'$unwind': {'path': '$feed', 'preserveNullAndEmptyArrays': True}},
+        {'$project': {'views': 1, 'viewers': 1, 'name': '$feed.name'}},
+    ]
+    return list(get_analytics_db()['feed_views'].aggregate(pipeline, allowDiskUse=True))
+
+def resolve_user_id(user):
+    if user.isdigit():
+        return int(user)
+    document = get_analytics_db()['users'].find_one({'username': user}, {'_id': 1})
+    return document['_id'] if document else None
+
+def _window_text(since):
+    return f" since {since}" if since else ""
+
+def format_top_articles(results, interaction_type, since):
+    if not results:
+        return f"No {interaction_type} interactions found{_window_text(since)}."
+    lines = []
+    for doc in results:
+        title = doc.get('title') or f"Article {doc['_id']}"
+        lines.append(f"- **{title}** ({doc['count']} {interaction_type}s)")
+    verb = INTERACTION_VERBS[interaction_type]
+    return f"Here are the most {verb} articles{_window_text(since)}:\n" + '\n'.join(lines)
+
+def format_category_affinity(results, user):
+    if not results:
+        return f"No category activity found for user {user}."
+    lines = []
+    for doc in results:
+        name = doc.get('name') or f"Category {doc['_id']}"
+        preferred = ", preferred" if doc.get('preferred') else ""
+        lines.append(f"- **{name}** (score {doc['score']}, {doc['interactions']} interactions{preferred})")
+    return f"Category affinity for user {user}:\n" + '\n'.join(lines)
+
+def format_feed_popularity(results, since):
+    if not results:
+        return f"No feed views found{_window_text(since)}."
+    lines = []
+    for doc in results:
+        name = doc.get('name') or f"Feed {doc['_id']}"
+        lines.append(f"- **{name}** ({doc['views']} views, {doc['viewers']} viewers)")
+    return f"Here are the most popular feeds{_window_text(since)}:\n" + '\n'.join(lines)
+
+def process_rss_analytics(user_request, intent=None):
+    user_request = user_request.lower()
+    intent = intent or match_rss_intent(user_request)
+    logger.debug("RSS analytics intent '%s' for request: %s", intent, user_request)
+    since = parse_window(user_request)
+    try:
+        if intent == 'top_articles':
+            match = INTERACTION_TYPE_PATTERN.search(user_request)
+            interaction_type = INTERACTION_TYPES[match.group(1)] if match else 'view'
+            results = top_articles(interaction_type, since=since, limit=parse_limit(user_request))
+            return format_top_articles(results, interaction_type, since)
+        if intent == 'category_affinity':
+            user = USER_PATTERN.search(user_request).group('user')
+            user_id = resolve_user_id(user)
+            if user_id is None:
+                return f"No user named {user} was found."
+            results = category_affinity(user_id, since=since, limit=parse_limit(user_request, default=5))
+            return format_category_affinity(results, user)
+        if intent == 'feed_popularity':
+            results = feed_popularity(since=since, limit=parse_limit(user_request))
+            return format_feed_popularity(results, since)
+    except Exception as e:
+        logger.error("Failed to run RSS analytics for '%s': %s", intent, e)
+        return "Sorry, I couldn't run that analysis."
+    return None
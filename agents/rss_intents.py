@@ -0,0 +1,57 @@
+# agents/rss_intents.py
+
+import re
+from datetime import datetime, timedelta
+
+# Timestamps in the RSS collections are 'YYYY-MM-DD HH:MM:SS' strings, which
+# sort lexicographically in time order, so windows are plain string ranges
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+INTERACTION_VERBS = {'view': 'viewed', 'like': 'liked', 'share': 'shared'}
+
+INTERACTION_TYPES = {
+    'view': 'view', 'viewed': 'view', 'read': 'view',
+    'like': 'like', 'liked': 'like',
+    'share': 'share', 'shared': 'share',
+}
+
+TOP_ARTICLES_PATTERN = re.compile(r"\b(?:top|most|popular|trending)\b.*\b(?:articles?|items?|stories)\b")
+AFFINITY_PATTERN = re.compile(r"\b(?:affinity|interests?|favou?rite\s+categor(?:y|ies)|categor(?:y|ies))\b")
+FEED_POPULARITY_PATTERN = re.compile(
+    r"\b(?:top|most|popular|trending|popularity)\b.*\bfeeds?\b|\bfeeds?\b.*\b(?:most|popular|popularity|trending)\b"
+)
+INTERACTION_TYPE_PATTERN = re.compile(r"\b(" + '|'.join(INTERACTION_TYPES) + r")\b")
+RECOMMEND_PATTERN = re.compile(r"\b(?:recommend\w*|suggest\w*|what\s+should\b.*\bread)\b")
+USER_PATTERN = re.compile(r"\buser\s+(?:id\s+)?#?(?P<user>\w+)")
+LAST_WINDOW_PATTERN = re.compile(r"\b(?:last|past)\s+(?:(?P<count>\d+)\s+)?(?P<unit>hour|day|week|month)s?\b")
+SINCE_PATTERN = re.compile(r"\bsince\s+(?P<date>\d{4}-\d{2}-\d{2})\b")
+LIMIT_PATTERN = re.compile(r"\btop\s+(?P<limit>\d+)\b")
+
+WINDOW_UNITS = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1),
+                'month': timedelta(days=30)}
+
+def parse_window(user_request, now=None):
+    match = LAST_WINDOW_PATTERN.search(user_request)
+    if match:
+        count = int(match.group('count') or 1)
+        since = (now or datetime.now()) - count * WINDOW_UNITS[match.group('unit')]
+        return since.strftime(TIME_FORMAT)
+    match = SINCE_PATTERN.search(user_request)
+    if match:
+        return f"{match.group('date')} 00:00:00"
+    return None
+
+def parse_limit(user_request, default=10):
+    match = LIMIT_PATTERN.search(user_request)
+    return min(int(match.group('limit')), 100) if match else default
+
+def match_rss_intent(user_request):
+    if RECOMMEND_PATTERN.search(user_request) and USER_PATTERN.search(user_request):
+        return 'recommendations'
+    if FEED_POPULARITY_PATTERN.search(user_request):
+        return 'feed_popularity'
+    if TOP_ARTICLES_PATTERN.search(user_request):
+        return 'top_articles'
+    if AFFINITY_PATTERN.search(user_request) and USER_PATTERN.search(user_request):
+        return 'category_affinity'
+    return None
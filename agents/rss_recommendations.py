@@ -0,0 +1,258 @@
+# agents/rss_recommendations.py
+
+import heapq
+import math
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pymongo import ReplaceOne
+from agents.rss_analytics import INTERACTION_WEIGHTS, PREFERENCE_WEIGHT, interaction_weight_expression, resolve_user_id
+from agents.rss_intents import USER_PATTERN, parse_limit
+from utils.db_utils import get_analytics_db, get_db
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Per-user top-K reading recommendations, materialized so the user agent can
+# answer with a single _id lookup. A full rebuild computes candidate pools
+# (the most popular items per category and per feed, plus a global pool) and
+# scores every user against them; afterwards only users with new
+# article_interactions are rescored, against the stored pools.
+RECOMMENDATIONS_COLLECTION = 'user_recommendations'
+CANDIDATES_COLLECTION = 'recommendation_candidates'
+STATE_COLLECTION = 'recommendation_state'
+# Collections whose changes alter a user's recommendations
+RECOMMENDATION_INPUTS = ('article_interactions', 'user_category_preferences', 'user_feed_preferences')
+
+RECOMMENDATIONS_TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', '20'))
+CANDIDATE_POOL_SIZE = int(os.getenv('RECOMMENDATION_POOL_SIZE', '100'))
+USER_BATCH_SIZE = int(os.getenv('RECOMMENDATION_USER_BATCH_SIZE', '500'))
+IN_QUERY_CHUNK = 10000
+
+FEED_WEIGHT = 4  # Bonus for items from a feed the user subscribes to
+POPULARITY_WEIGHT = 1.0  # Applied to log1p of the item's weighted interaction count
+TOP_CATEGORIES = 5  # Categories per user whose pools are considered
+
+def _chunks(values, size=IN_QUERY_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _push_capped(heap, entry, size):
+    if len(heap) < size:
+        heapq.heappush(heap, entry)
+    elif entry > heap[0]:
+        heapq.heapreplace(heap, entry)
+
+def item_popularity(db):
+    pipeline = [{'$group': {'_id': '$rss_item_id', 'score': {'$sum': interaction_weight_expression()}}}]
+    return {doc['_id']: doc['score'] for doc in db['article_interactions'].aggregate(pipeline, allowDiskUse=True)}
+
+def build_candidate_pools(pool_size=CANDIDATE_POOL_SIZE):
+    db = get_db()
+    popularity = item_popularity(db)
+    # Heaps hold (popularity, item_id), so ties go to the newest item
+    heaps = defaultdict(list)
+    for doc in db['rss_item_categories'].find({}, {'_id': 0, 'rss_item_id': 1, 'category_id': 1}, batch_size=5000):
+        item_id = doc['rss_item_id']
+        _push_capped(heaps[f"category:{doc['category_id']}"], (popularity.get(item_id, 0), item_id), pool_size)
+    for doc in db['rss_items'].find({}, {'rss_feed_id': 1}, batch_size=5000):
+        entry = (popularity.get(doc['_id'], 0), doc['_id'])
+        _push_capped(heaps[f"feed:{doc.get('rss_feed_id')}"], entry, pool_size)
+        _push_capped(heaps['global'], entry, pool_size)
+
+    candidate_ids = {item_id for heap in heaps.values() for _, item_id in heap}
+    items = {}
+    for chunk in _chunks(candidate_ids):
+        for doc in db['rss_items'].find({'_id': {'$in': chunk}}, {'title': 1, 'link': 1, 'rss_feed_id': 1}):
+            items[doc['_id']] = {
+                'rss_item_id': doc['_id'],
+                'title': doc.get('title'),
+                'link': doc.get('link'),
+                'rss_feed_id': doc.get('rss_feed_id'),
+                'popularity': popularity.get(doc['_id'], 0),
+                'categories': [],
+            }
+        for doc in db['rss_item_categories'].find({'rss_item_id': {'$in': chunk}},
+                                                  {'_id': 0, 'rss_item_id': 1, 'category_id': 1}):
+            if doc['rss_item_id'] in items:
+                items[doc['rss_item_id']]['categories'].append(doc['category_id'])
+
+    pools = {key: [items[item_id] for _, item_id in sorted(heap, reverse=True) if item_id in items]
+             for key, heap in heaps.items()}
+    candidates = db[CANDIDATES_COLLECTION]
+    if pools:
+        candidates.bulk_write([ReplaceOne({'_id': key}, {'_id': key, 'items': pool}, upsert=True)
+                               for key, pool in pools.items()], ordered=False)
+    candidates.delete_many({'_id': {'$nin': list(pools)}})
+    return pools
+
+def load_candidate_pools():
+    return {doc['_id']: doc['items'] for doc in get_db()[CANDIDATES_COLLECTION].find()}
+
+def user_profiles(db, user_ids):
+    profiles = {user_id: {'preferred': set(), 'feeds': set(), 'interactions': []} for user_id in user_ids}
+    query = {'user_id': {'$in': list(user_ids)}}
+    for doc in db['user_category_preferences'].find(query, {'_id': 0, 'user_id': 1, 'category_id': 1}):
+        profiles[doc['user_id']]['preferred'].add(doc['category_id'])
+    for doc in db['user_feed_preferences'].find(query, {'_id': 0, 'user_id': 1, 'rss_feed_id': 1}):
+        profiles[doc['user_id']]['feeds'].add(doc['rss_feed_id'])
+    interacted = set()
+    for doc in db['article_interactions'].find(query, {'_id': 0, 'user_id': 1, 'rss_item_id': 1,
+                                                       'interaction_type': 1}):
+        profiles[doc['user_id']]['interactions'].append((doc['rss_item_id'], doc.get('interaction_type')))
+        interacted.add(doc['rss_item_id'])
+    item_categories = defaultdict(list)
+    for chunk in _chunks(interacted):
+        for doc in db['rss_item_categories'].find({'rss_item_id': {'$in': chunk}},
+                                                  {'_id': 0, 'rss_item_id': 1, 'category_id': 1}):
+            item_categories[doc['rss_item_id']].append(doc['category_id'])
+    return profiles, item_categories
+
+def score_user(profile, item_categories, pools, top_k=RECOMMENDATIONS_TOP_K):
+    affinity = defaultdict(float)
+    for category_id in profile['preferred']:
+        affinity[category_id] += PREFERENCE_WEIGHT
+    seen = set()
+    for item_id, interaction_type in profile['interactions']:
+        seen.add(item_id)
+        weight = INTERACTION_WEIGHTS.get(interaction_type, 1)
+        for category_id in item_categories.get(item_id, ()):
+            affinity[category_id] += weight
+
+    pool_keys = [f"category:{category_id}" for category_id in
+                 heapq.nlargest(TOP_CATEGORIES, affinity, key=affinity.get)]
+    pool_keys.extend(f"feed:{feed_id}" for feed_id in profile['feeds'])
+    pool_keys.append('global')
+    candidates = {}
+    for key in pool_keys:
+        for item in pools.get(key, ()):
+            candidates[item['rss_item_id']] = item
+
+    scored = []
+    for item_id, item in candidates.items():
+        if item_id in seen:
+            continue
+        score = sum(affinity.get(category_id, 0.0) for category_id in item['categories'])
+        if item['rss_feed_id'] in profile['feeds']:
+            score += FEED_WEIGHT
+        score += POPULARITY_WEIGHT * math.log1p(item['popularity'])
+        scored.append((score, item_id, item))
+    return [
+        {'rss_item_id': item_id, 'score': round(score, 3), 'title': item['title'], 'link': item['link']}
+        for score, item_id, item in heapq.nlargest(top_k, scored, key=lambda entry: entry[:2])
+    ]
+
+def refresh_user_recommendations(user_ids, pools=None, top_k=RECOMMENDATIONS_TOP_K):
+    db = get_db()
+    if pools is None:
+        pools = load_candidate_pools() or build_candidate_pools()
+    written = 0
+    for batch in _chunks(user_ids, USER_BATCH_SIZE):
+        profiles, item_categories = user_profiles(db, batch)
+        now = datetime.now(timezone.utc)
+        operations = [
+            ReplaceOne({'_id': user_id}, {
+                '_id': user_id,
+                'items': score_user(profile, item_categories, pools, top_k),
+                'updated_at': now,
+            }, upsert=True)
+            for user_id, profile in profiles.items()
+        ]
+        if operations:
+            db[RECOMMENDATIONS_COLLECTION].bulk_write(operations, ordered=False)
+            written += len(operations)
+    return written
+
+def _latest_interaction_time(db):
+    latest = db['article_interactions'].find_one({}, {'interaction_time': 1}, sort=[('interaction_time', -1)])
+    return latest.get('interaction_time') if latest else None
+
+def _save_watermark(db, interaction_time):
+    if interaction_time is not None:
+        db[STATE_COLLECTION].update_one({'_id': 'interactions'},
+                                        {'$set': {'interaction_time': interaction_time}}, upsert=True)
+
+def rebuild_recommendations(top_k=RECOMMENDATIONS_TOP_K, pool_size=CANDIDATE_POOL_SIZE):
+    db = get_db()
+    start = time.perf_counter()
+    # Read the watermark first so interactions arriving mid-build are picked up incrementally
+    watermark = _latest_interaction_time(db)
+    pools = build_candidate_pools(pool_size)
+    user_ids = [doc['_id'] for doc in db['users'].find({}, {'_id': 1})]
+    written = refresh_user_recommendations(user_ids, pools, top_k)
+    _save_watermark(db, watermark)
+    elapsed = time.perf_counter() - start
+    logger.debug("Rebuilt recommendations for %s users from %s pools in %.2fs.", written, len(pools), elapsed)
+    return {'users': written, 'pools': len(pools), 'elapsed': elapsed}
+
+def update_recommendations_from_interactions(since=None, top_k=RECOMMENDATIONS_TOP_K):
+    # Rescores only users with interactions at or after the watermark. Pools
+    # keep the popularity of the last full rebuild until the next one.
+    db = get_db()
+    start = time.perf_counter()
+    if since is None:
+        state = db[STATE_COLLECTION].find_one({'_id': 'interactions'})
+        since = state.get('interaction_time') if state else None
+    query = {'interaction_time': {'$gte': since}} if since else {}
+    user_ids = set()
+    watermark = since
+    for doc in db['article_interactions'].find(query, {'_id': 0, 'user_id': 1, 'interaction_time': 1}):
+        user_ids.add(doc['user_id'])
+        if watermark is None or doc['interaction_time'] > watermark:
+            watermark = doc['interaction_time']
+    written = refresh_user_recommendations(sorted(user_ids), top_k=top_k) if user_ids else 0
+    _save_watermark(db, watermark)
+    elapsed = time.perf_counter() - start
+    logger.debug("Updated recommendations for %s users since %s in %.2fs.", written, since, elapsed)
+    return {'users': written, 'since': since, 'watermark': watermark, 'elapsed': elapsed}
+
+def apply_preference_changes(changes):
+    # Change events on the scoring inputs: rescore just the users they touch
+    user_ids = set()
+    for change in changes:
+        for document in (change.get('fullDocument'), change.get('fullDocumentBeforeChange')):
+            if document and 'user_id' in document:
+                user_ids.add(document['user_id'])
+    if user_ids:
+        written = refresh_user_recommendations(sorted(user_ids))
+        logger.debug("Rescored %s users from %s change events.", written, len(changes))
+
+def start_recommendation_watcher():
+    from utils.change_streams import ChangeStreamWatcher, enable_pre_images
+    enable_pre_images(*RECOMMENDATION_INPUTS)
+    # The resume token is persisted, so a restart picks up where it stopped;
+    # without one, the interaction watermark catches up instead
+    watcher = ChangeStreamWatcher('recommendations', RECOMMENDATION_INPUTS, apply_preference_changes,
+                                  resync=update_recommendations_from_interactions, persist=True,
+                                  full_document_before_change='whenAvailable')
+    watcher.start()
+    return watcher
+
+def get_recommendations(user_id, limit=10):
+    document = get_analytics_db()[RECOMMENDATIONS_COLLECTION].find_one(
+        {'_id': user_id}, {'items': {'$slice': limit}, 'updated_at': 1})
+    return document['items'] if document else None
+
+def format_recommendations(items, user):
+    if items is None:
+        return f"No recommendations have been computed for user {user} yet."
+    if not items:
+        return f"There are no new articles to recommend to user {user}."
+    lines = []
+    for item in items:
+        title = item.get('title') or f"Article {item['rss_item_id']}"
+        lines.append(f"- **{title}** ({item['link']})" if item.get('link') else f"- **{title}**")
+    return f"Recommended reading for user {user}:\n" + '\n'.join(lines)
+
+def process_recommendation_request(user_request):
+    user = USER_PATTERN.search(user_request).group('user')
+    try:
+        user_id = resolve_user_id(user)
+        if user_id is None:
+            return f"No user named {user} was found."
+        return format_recommendations(get_recommendations(user_id, parse_limit(user_request)), user)
+    except Exception as e:
+        logger.error("Failed to read recommendations for user %s: %s", user, e)
+        return "Sorry, I couldn't retrieve recommendations."
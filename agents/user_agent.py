@@ -1,7 +1,11 @@
 # agents/user_agent.py
 
 from swarm import Agent
-from utils.db_utils import db, run_mongodb_query
+from agents.direct_response import final_response, is_direct_intent
+from agents.rss_analytics import process_rss_analytics
+from agents.rss_intents import match_rss_intent
+from agents.rss_recommendations import process_recommendation_request
+from utils.db_utils import run_mongodb_query
 
 def transfer_back_to_router_agent():
     from agents.router_agent import router_agent
@@ -9,14 +13,29 @@ def transfer_back_to_router_agent():
 
 def process_user_request(user_request):
     user_request_lower = user_request.lower()
+    # Feed, article and category questions are answered by server-side aggregations,
+    # recommendations by a single read of the precomputed per-user list
+    rss_intent = match_rss_intent(user_request_lower)
+    if rss_intent:
+        if rss_intent == 'recommendations':
+            response = process_recommendation_request(user_request_lower)
+        else:
+            response = process_rss_analytics(user_request_lower, rss_intent)
+        if is_direct_intent(rss_intent):
+            return final_response(response)
+        return response
     if "users" in user_request_lower or "user" in user_request_lower:
         projection = {'password_hash': 0}  # Exclude sensitive data
-        return run_mongodb_query('users', {}, projection)
+        response = run_mongodb_query('users', {}, projection)
+        if is_direct_intent('users'):
+            return final_response(response)
+        return response
     else:
         return transfer_back_to_router_agent()
 
 def get_data_agent_instructions():
-    return """You are a data expert who helps the user with data related to users."""
+    return """You are a data expert who helps the user with data related to users, their RSS feeds,
+articles, categories and article interactions."""
 
 user_agent = Agent(
     name="User Agent",
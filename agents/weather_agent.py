@@ -1,359 +1,605 @@
 # agents/weather_agent.py
 
 import os
-import re
 import requests
+from collections import namedtuple
 from datetime import datetime, timedelta
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 from swarm import Agent
-from utils.db_utils import db
-from dotenv import load_dotenv
+from utils.db_utils import get_analytics_db, get_db, normalize_city_name
+from utils.cache_utils import TTLCache
+from utils.singleflight import SingleFlight
+from agents.direct_response import final_response, is_direct_intent
+from agents.weather_history import HISTORY_COLLECTION, history_document
+from agents.weather_intents import extract_city_name, match_intent
+from agents.weather_stats import CITY_STATS_COLLECTION, city_stats_update, delete_city_stats
+from utils.weather_client import get_weather_client
 
-# Load environment variables
-load_dotenv()
+# Environment variables are loaded once by utils.db_utils
 
-# Import analytics functions (assuming process_weather_analytics is defined elsewhere)
-from agents.weather_analytics import process_weather_analytics
+from agents.weather_analytics import get_temperature_history
+from agents.city_gazetteer import Resolution, loaded_gazetteer, remember_cities, resolve_city
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
 
 MAX_DATA_AGE = timedelta(hours=1)  # Data is considered outdated after 1 hour
+WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', '512'))
 
-def extract_city_name(user_request):
-    user_request = user_request.lower().strip()
-    print(f"[DEBUG] Extracting city name from user request: {user_request}")
-
-    # Remove phrases like 'from database' or 'weather data for'
-    user_request = re.sub(r"\s+from\s+(?:the\s+)?(?:database|weather database)$", "", user_request)
-    user_request = re.sub(r"^(update|refresh)\s+(?:the\s+city\s+of\s+)?(?:weather\s+data\s+for\s+)?", "", user_request)
-    user_request = re.sub(r"^(get|show|provide)\s+(?:the\s+)?(?:current\s+)?weather\s+for\s+", "", user_request)
-    user_request = re.sub(r"^(get|show|provide)\s+(?:the\s+)?forecast\s+for\s+", "", user_request)
-
-    # Attempt to extract city name
-    match = re.search(r"^([\w\s,]+)$", user_request)
-    if match:
-        city_name = match.group(1).strip()
-        print(f"[DEBUG] Extracted city name: {city_name}")
-        return city_name
-    else:
-        print("[DEBUG] Could not extract city name.")
+# The fields the weather answers read. Lookups project just these and the
+# cache holds them as tuples instead of whole OpenWeatherMap documents.
+WeatherRecord = namedtuple('WeatherRecord', ['name', 'temp', 'humidity', 'wind_speed', 'description',
+                                             'visibility', 'dt', 'modified_at'])
+WEATHER_RECORD_PROJECTION = {
+    '_id': 0, 'name': 1, 'main.temp': 1, 'main.humidity': 1, 'wind.speed': 1,
+    'weather.description': 1, 'visibility': 1, 'dt': 1, 'modified_at': 1,
+}
+
+def weather_record(weather_data):
+    main = weather_data.get('main') or {}
+    conditions = weather_data.get('weather') or [{}]
+    return WeatherRecord(
+        weather_data['name'],
+        main.get('temp'),
+        main.get('humidity'),
+        (weather_data.get('wind') or {}).get('speed'),
+        conditions[0].get('description', ''),
+        weather_data.get('visibility'),
+        weather_data.get('dt'),
+        weather_data.get('modified_at'),
+    )
+
+# In-process cache of fresh weather records keyed by normalized city name
+weather_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=MAX_DATA_AGE.total_seconds())
+
+# Concurrent refreshes of the same city share one API call and one write
+weather_updates = SingleFlight()
+
+# Aggregate questions are answered from a NumPy snapshot of weather_data when
+# numpy is installed; otherwise they fall back to MongoDB queries
+WEATHER_SNAPSHOT_ENABLED = os.getenv('WEATHER_SNAPSHOT_ENABLED', '1').lower() not in ('0', 'false', 'no')
+_snapshot_unavailable = not WEATHER_SNAPSHOT_ENABLED
+
+def get_weather_cache_stats():
+    return weather_cache.stats()
+
+def _snapshot_module():
+    global _snapshot_unavailable
+    if _snapshot_unavailable:
         return None
+    try:
+        from agents import weather_snapshot
+    except ImportError as e:
+        logger.warning("Weather snapshot disabled: %s", e)
+        _snapshot_unavailable = True
+        return None
+    return weather_snapshot
+
+def analytics_snapshot():
+    module = _snapshot_module()
+    if module is None:
+        return None
+    snapshot = module.get_weather_snapshot()
+    snapshot.ensure_fresh()
+    return snapshot
+
+def _write_through_snapshot(payloads):
+    module = _snapshot_module()
+    snapshot = module.loaded_snapshot() if module else None
+    if snapshot is not None:
+        snapshot.upsert(payloads)
 
 def fetch_weather_data(city_name):
+    return request_weather_api('weather', {'q': city_name})
+
+def fetch_weather_by_id(city_id):
+    return request_weather_api('weather', {'id': city_id})
+
+def locate_city(city_name):
+    # What the user typed, resolved to a known city where possible
+    try:
+        return resolve_city(city_name)
+    except Exception as e:
+        logger.warning("City gazetteer unavailable, using the name as given: %s", e)
+        return Resolution(None, city_name, None)
+
+def correct_city_name(query):
+    # Only for names the API found nothing under; never loads the gazetteer
+    gazetteer = loaded_gazetteer()
+    return gazetteer.correct(query) if gazetteer is not None else Resolution(None, query, None)
+
+def learn_city(query, weather_data):
+    gazetteer = loaded_gazetteer()
+    if gazetteer is not None:
+        gazetteer.learn(query, weather_data.get('id'))
+
+def city_lookup(city):
+    # Cache key and weather_data filter for a resolved city
+    if city.entry is not None:
+        return city.entry.name_key, {'id': city.entry.id}
+    name_key = normalize_city_name(city.query)
+    return name_key, {'name_key': name_key}
+
+def request_weather_api(endpoint, params):
     api_key = os.getenv('OPEN_WEATHER_API')
     if not api_key:
-        print("[ERROR] OpenWeatherMap API key is not set.")
+        logger.error("OpenWeatherMap API key is not set.")
         return None, "OpenWeatherMap API key is not set."
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
-    params = {
-        'q': city_name,
-        'appid': api_key,
-        'units': 'metric'
-    }
-    print(f"[DEBUG] Fetching weather data for '{city_name}' with params: {params}")
+    # The API key is added after logging so it never reaches the logs
+    params = dict(params, units='metric')
+    logger.debug("Fetching weather data from '%s' with params: %s", endpoint, params)
     try:
-        response = requests.get(base_url, params=params)
+        response = get_weather_client().get(endpoint, dict(params, appid=api_key))
         data = response.json()
-        print(f"[DEBUG] API response status code: {response.status_code}")
+        logger.debug("API response status code: %s", response.status_code)
         if response.status_code != 200:
             error_message = data.get('message', 'Error fetching weather data.')
-            print(f"[ERROR] API Error: {error_message}")
+            logger.error("API Error: %s", error_message)
             return None, f"API Error: {error_message}"
         return data, None
-    except requests.RequestException as e:
-        print(f"[ERROR] Request failed: {e}")
+    except (requests.RequestException, ValueError) as e:
+        logger.error("Request failed: %s", e)
         return None, f"Request failed: {e}"
 
-def store_weather_data(weather_data):
-    collection = db['weather_data']
-    city_id = weather_data.get('id')  # Unique city ID from API
-    current_time = datetime.utcnow()
+def weather_upsert(weather_data, current_time):
+    # created_at is only written on insert, so concurrent writers never race on it
+    weather_data.pop('_id', None)
+    weather_data.pop('created_at', None)
+    weather_data['name_key'] = normalize_city_name(weather_data['name'])
     weather_data['modified_at'] = current_time
+    return (
+        {'id': weather_data['id']},
+        {'$set': weather_data, '$setOnInsert': {'created_at': current_time}},
+    )
+
+def weather_writes(payloads, current_time):
+    # Bulk operations storing payloads, per collection; weather_data comes
+    # first and stamps name_key/modified_at on the payloads the rest read
+    writes = {'weather_data': [UpdateOne(*weather_upsert(weather_data, current_time), upsert=True)
+                               for weather_data in payloads]}
+    writes[CITY_STATS_COLLECTION] = [UpdateOne(*city_stats_update(weather_data), upsert=True)
+                                     for weather_data in payloads]
+    writes[HISTORY_COLLECTION] = [InsertOne(history_document(weather_data)) for weather_data in payloads]
+    return writes
+
+def weather_write_outcome(result=None, exception=None):
+    # (written, error) for the weather_data bulk write, sync or async
+    if exception is None:
+        return result.upserted_count + result.matched_count, None
+    if isinstance(exception, BulkWriteError):
+        written = exception.details.get('nUpserted', 0) + exception.details.get('nMatched', 0)
+        error = f"{len(exception.details.get('writeErrors', []))} writes failed"
+        logger.error("Bulk weather write partially failed: %s", error)
+        return written, error
+    logger.error("Failed to store weather data: %s", exception)
+    return 0, f"Bulk write failed: {exception}"
 
+def weather_stored(payloads):
+    # The payloads are now the freshest copies, so serve them without another round trip
+    for weather_data in payloads:
+        weather_cache.set(normalize_city_name(weather_data['name']), weather_record(weather_data))
+    _write_through_snapshot(payloads)
+    remember_cities(payloads)
+
+def weather_follow_up_failed(collection_name, exception):
+    # Rollups and history lag behind until the next write; the weather is stored
+    logger.error("Failed to update %s after storing weather data: %s", collection_name, exception)
+
+def store_weather_data(weather_data):
+    return store_weather_data_many([weather_data])
+
+def store_weather_data_many(payloads):
+    if not payloads:
+        return 0, None
+    db = get_db()
+    writes = weather_writes(payloads, datetime.utcnow())
     try:
-        # Check if the document exists
-        existing_doc = collection.find_one({'id': city_id})
-        if existing_doc:
-            weather_data['created_at'] = existing_doc.get('created_at', current_time)
-            # Update existing document
-            collection.update_one(
-                {'id': city_id},
-                {'$set': weather_data}
-            )
-            print(f"[DEBUG] Updated weather data for city: {weather_data['name']}")
-        else:
-            # Set created_at for new document
-            weather_data['created_at'] = current_time
-            # Insert new document
-            collection.insert_one(weather_data)
-            print(f"[DEBUG] Inserted new weather data for city: {weather_data['name']}")
+        written, error = weather_write_outcome(db['weather_data'].bulk_write(writes.pop('weather_data'), ordered=False))
     except Exception as e:
-        print(f"[ERROR] Failed to store weather data: {e}")
+        written, error = weather_write_outcome(exception=e)
+    if not written:
+        return written, error
+    weather_stored(payloads)
+    for collection_name, operations in writes.items():
+        try:
+            db[collection_name].bulk_write(operations, ordered=False)
+        except Exception as e:
+            weather_follow_up_failed(collection_name, e)
+    logger.debug("Stored weather data for %s cities in one bulk write.", written)
+    return written, error
+
+def apply_weather_changes(changes):
+    # Change events from any process: the cache gets the written document (or
+    # loses the deleted one) and the snapshot gets the row delta
+    module = _snapshot_module()
+    snapshot = module.loaded_snapshot() if module else None
+    upserts = []
+    for change in changes:
+        if change['operationType'] == 'delete':
+            document = change.get('fullDocumentBeforeChange')
+            if document is None:
+                # Without a pre-image the deleted city is unknown
+                resync_weather_caches()
+                return
+            # Legacy documents may predate the name_key backfill
+            name_key = document.get('name_key') or normalize_city_name(document.get('name') or '')
+            if not name_key:
+                continue
+            weather_cache.invalidate(name_key)
+            if snapshot is not None and document.get('id') is not None:
+                snapshot.remove(document['id'])
+            continue
+        document = change.get('fullDocument')
+        if document is None or 'name_key' not in document:
+            # Deleted again before the lookup; its delete event follows
+            continue
+        record = weather_record(document)
+        weather_cache.set(document['name_key'], record, ttl=remaining_freshness(record).total_seconds())
+        upserts.append(document)
+    if snapshot is not None and upserts:
+        snapshot.upsert(upserts)
+    # Deleted cities stay in the gazetteer: their ids remain valid for the API
+    remember_cities(upserts)
+
+def resync_weather_caches():
+    weather_cache.clear()
+    module = _snapshot_module()
+    snapshot = module.loaded_snapshot() if module else None
+    if snapshot is not None:
+        snapshot.request_reload()
 
-def update_weather_for_city(city_name):
-    print(f"[DEBUG] Updating weather data for city: {city_name}")
-    weather_data, error = fetch_weather_data(city_name)
+def start_weather_watcher():
+    from utils.change_streams import ChangeStreamWatcher, enable_pre_images
+    enable_pre_images('weather_data')
+    module = _snapshot_module()
+    if module is not None:
+        module.get_weather_snapshot().follow_change_stream()
+    watcher = ChangeStreamWatcher('weather_data', ['weather_data'], apply_weather_changes,
+                                  resync=resync_weather_caches, full_document_before_change='whenAvailable')
+    watcher.start()
+    return watcher
+
+def update_weather_for_city(city_name, city=None):
+    city = city or locate_city(city_name)
+    if city.entry is not None:
+        return weather_updates.do(f'id:{city.entry.id}', _update_weather_for_city, city)
+    return weather_updates.do(normalize_city_name(city.query), _update_weather_for_city, city)
+
+def _update_weather_for_city(city):
+    logger.debug("Updating weather data for city: %s", city.query)
+    if city.entry is not None:
+        weather_data, error = fetch_weather_by_id(city.entry.id)
+    else:
+        weather_data, error = fetch_weather_data(city.query)
+        corrected = correct_city_name(city.query) if error else None
+        if corrected is not None and corrected.entry is not None:
+            logger.debug("No weather found for %s; trying %s.", city.query, corrected.entry.name)
+            weather_data, error = fetch_weather_by_id(corrected.entry.id)
     if error:
-        print(f"[ERROR] {error}")
+        logger.error("%s", error)
         return error
     else:
         store_weather_data(weather_data)
+        if city.entry is None:
+            learn_city(city.query, weather_data)
         return None
 
-def get_weather_from_db(city_name):
-    collection = db['weather_data']
+def remaining_freshness(record):
+    data_timestamp = record.modified_at or datetime.utcfromtimestamp(record.dt)
+    return MAX_DATA_AGE - (datetime.utcnow() - data_timestamp)
+
+def get_weather_from_db(city_name, city=None):
+    cache_key, query = city_lookup(city or locate_city(city_name))
+    cached = weather_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("Retrieved weather data for %s from cache.", city_name)
+        return cached
+    collection = get_db()['weather_data']
     try:
-        result = collection.find_one(
-            {'name': {'$regex': f'^{re.escape(city_name)}$', '$options': 'i'}}
-        )
+        result = collection.find_one(query, WEATHER_RECORD_PROJECTION)
         if not result:
-            print(f"[DEBUG] No weather data found in database for city: {city_name}")
+            logger.debug("No weather data found in database for city: %s", city_name)
             return None
-        data_timestamp = result.get('modified_at') or datetime.utcfromtimestamp(result['dt'])
-        if datetime.utcnow() - data_timestamp > MAX_DATA_AGE:
-            print(f"[DEBUG] Weather data for {city_name} is outdated.")
+        record = weather_record(result)
+        freshness = remaining_freshness(record)
+        if freshness < timedelta(0):
+            logger.debug("Weather data for %s is outdated.", city_name)
             return None
-        print(f"[DEBUG] Retrieved weather data for {city_name} from database.")
-        return result
+        logger.debug("Retrieved weather data for %s from database.", city_name)
+        weather_cache.set(cache_key, record, ttl=freshness.total_seconds())
+        return record
     except Exception as e:
-        print(f"[ERROR] Failed to retrieve weather data from database: {e}")
+        logger.error("Failed to retrieve weather data from database: %s", e)
         return None
 
-def format_weather_response(weather_data):
-    return (f"The current weather in {weather_data['name']}:\n"
-            f"- Temperature: {weather_data['main']['temp']}°C\n"
-            f"- Conditions: {weather_data['weather'][0]['description'].capitalize()}\n"
-            f"- Humidity: {weather_data['main']['humidity']}%\n"
-            f"- Wind Speed: {weather_data['wind']['speed']} m/s\n")
+def format_weather_response(record):
+    return (f"The current weather in {record.name}:\n"
+            f"- Temperature: {record.temp}°C\n"
+            f"- Conditions: {record.description.capitalize()}\n"
+            f"- Humidity: {record.humidity}%\n"
+            f"- Wind Speed: {record.wind_speed} m/s\n")
 
 def list_cities_in_database():
-    collection = db['weather_data']
+    collection = get_analytics_db()['weather_data']
     try:
         cities = collection.distinct('name')
         if not cities:
             return "There are no cities in the database."
         city_list = ', '.join(cities)
-        print(f"[DEBUG] Retrieved cities from database: {city_list}")
+        logger.debug("Retrieved cities from database: %s", city_list)
         return f"The following cities are in the database:\n" + '\n'.join(f"- {city}" for city in cities)
     except Exception as e:
-        print(f"[ERROR] Failed to list cities: {e}")
+        logger.error("Failed to list cities: %s", e)
         return "Sorry, I couldn't retrieve the list of cities."
 
 def get_average_temperature():
-    collection = db['weather_data']
+    collection = get_analytics_db()[CITY_STATS_COLLECTION]
     try:
+        snapshot = analytics_snapshot()
+        if snapshot is not None:
+            avg_temp = snapshot.mean('temp')
+            if avg_temp is None:
+                return "No temperature data available to calculate average."
+            return f"The average temperature among all cities is {avg_temp:.2f}°C."
         pipeline = [
             {"$group": {
                 "_id": None,
-                "averageTemp": {"$avg": "$main.temp"}
+                "averageTemp": {"$avg": "$temp_last"}
             }}
         ]
         result = list(collection.aggregate(pipeline))
-        if result:
+        if result and result[0]['averageTemp'] is not None:
             avg_temp = result[0]['averageTemp']
-            print(f"[DEBUG] Calculated average temperature: {avg_temp}")
+            logger.debug("Calculated average temperature: %s", avg_temp)
             return f"The average temperature among all cities is {avg_temp:.2f}°C."
         else:
             return "No temperature data available to calculate average."
     except Exception as e:
-        print(f"[ERROR] Failed to calculate average temperature: {e}")
+        logger.error("Failed to calculate average temperature: %s", e)
         return "Sorry, I couldn't calculate the average temperature."
 
 def delete_city_data(city_name):
-    collection = db['weather_data']
+    collection = get_db()['weather_data']
+    # Resolved like reads and updates, so aliases and accent-free names delete by id
+    cache_key, query = city_lookup(locate_city(city_name))
+    weather_cache.invalidate(cache_key)
     try:
-        result = collection.delete_one({'name': {'$regex': f'^{re.escape(city_name)}$', '$options': 'i'}})
-        if result.deleted_count > 0:
-            print(f"[DEBUG] Deleted weather data for city: {city_name}")
+        deleted = collection.find_one_and_delete(query, {'_id': 0, 'id': 1})
+        if deleted is not None:
+            # Only this city's rollup; others may share its name
+            delete_city_stats(deleted.get('id'))
+        module = _snapshot_module()
+        snapshot = module.loaded_snapshot() if module else None
+        if snapshot is not None and deleted is not None:
+            snapshot.remove(deleted.get('id'))
+        if deleted is not None:
+            logger.debug("Deleted weather data for city: %s", city_name)
             return f"The weather data for **{city_name}** has been successfully deleted from the database."
         else:
-            print(f"[DEBUG] No weather data found to delete for city: {city_name}")
+            logger.debug("No weather data found to delete for city: %s", city_name)
             return f"No weather data found for **{city_name}** to delete."
     except Exception as e:
-        print(f"[ERROR] Failed to delete city data: {e}")
+        logger.error("Failed to delete city data: %s", e)
         return "Sorry, I couldn't delete the city data."
 
 def get_hottest_cities():
-    collection = db['weather_data']
+    collection = get_analytics_db()['weather_data']
     try:
-        # Retrieve top 5 hottest cities
-        cursor = collection.find().sort('main.temp', -1).limit(5)
-        cities = []
-        for doc in cursor:
-            cities.append(f"- **{doc['name']}** ({doc['main']['temp']}°C)")
+        snapshot = analytics_snapshot()
+        if snapshot is not None:
+            cities = [f"- **{name}** ({temp}°C)" for name, temp in snapshot.top_n('temp', 5, largest=True)]
+        else:
+            # Retrieve top 5 hottest cities
+            cursor = collection.find({}, {'_id': 0, 'name': 1, 'main.temp': 1}).sort('main.temp', -1).limit(5)
+            cities = [f"- **{doc['name']}** ({doc['main']['temp']}°C)" for doc in cursor]
         if cities:
-            print(f"[DEBUG] Retrieved hottest cities: {cities}")
+            logger.debug("Retrieved hottest cities: %s", cities)
             return "Here are the hottest cities in the database:\n" + '\n'.join(cities)
         else:
             return "No data available to determine the hottest cities."
     except Exception as e:
-        print(f"[ERROR] Failed to retrieve hottest cities: {e}")
+        logger.error("Failed to retrieve hottest cities: %s", e)
         return "Sorry, I couldn't retrieve the list of hottest cities."
 
 def get_coldest_cities():
-    collection = db['weather_data']
+    collection = get_analytics_db()['weather_data']
     try:
-        # Retrieve top 5 coldest cities
-        cursor = collection.find().sort('main.temp', 1).limit(5)
-        cities = []
-        for doc in cursor:
-            cities.append(f"- **{doc['name']}** ({doc['main']['temp']}°C)")
+        snapshot = analytics_snapshot()
+        if snapshot is not None:
+            cities = [f"- **{name}** ({temp}°C)" for name, temp in snapshot.top_n('temp', 5, largest=False)]
+        else:
+            # Retrieve top 5 coldest cities
+            cursor = collection.find({}, {'_id': 0, 'name': 1, 'main.temp': 1}).sort('main.temp', 1).limit(5)
+            cities = [f"- **{doc['name']}** ({doc['main']['temp']}°C)" for doc in cursor]
         if cities:
-            print(f"[DEBUG] Retrieved coldest cities: {cities}")
+            logger.debug("Retrieved coldest cities: %s", cities)
             return "Here are the coldest cities in the database:\n" + '\n'.join(cities)
         else:
             return "No data available to determine the coldest cities."
     except Exception as e:
-        print(f"[ERROR] Failed to retrieve coldest cities: {e}")
+        logger.error("Failed to retrieve coldest cities: %s", e)
         return "Sorry, I couldn't retrieve the list of coldest cities."
 
 def get_average_humidity():
-    collection = db['weather_data']
+    collection = get_analytics_db()[CITY_STATS_COLLECTION]
     try:
+        snapshot = analytics_snapshot()
+        if snapshot is not None:
+            avg_humidity = snapshot.mean('humidity')
+            if avg_humidity is None:
+                return "No humidity data available to calculate average."
+            return f"The average humidity across all cities is {avg_humidity:.2f}%."
         pipeline = [
             {"$group": {
                 "_id": None,
-                "averageHumidity": {"$avg": "$main.humidity"}
+                "averageHumidity": {"$avg": "$humidity_last"}
             }}
         ]
         result = list(collection.aggregate(pipeline))
-        if result:
+        if result and result[0]['averageHumidity'] is not None:
             avg_humidity = result[0]['averageHumidity']
-            print(f"[DEBUG] Calculated average humidity: {avg_humidity}")
+            logger.debug("Calculated average humidity: %s", avg_humidity)
             return f"The average humidity across all cities is {avg_humidity:.2f}%."
         else:
             return "No humidity data available to calculate average."
     except Exception as e:
-        print(f"[ERROR] Failed to calculate average humidity: {e}")
+        logger.error("Failed to calculate average humidity: %s", e)
         return "Sorry, I couldn't calculate the average humidity."
 
+def _interpolated_percentiles(values, percentiles):
+    # Linear interpolation between closest ranks, as numpy.percentile does
+    values = sorted(values)
+    results = {}
+    for percentile in percentiles:
+        position = (len(values) - 1) * percentile / 100
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        results[percentile] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+    return results
+
+def get_temperature_percentiles(percentiles=(10, 25, 50, 75, 90)):
+    try:
+        snapshot = analytics_snapshot()
+        if snapshot is not None:
+            results = snapshot.percentiles('temp', percentiles)
+        else:
+            cursor = get_analytics_db()['weather_data'].find(
+                {'main.temp': {'$type': 'number'}}, {'_id': 0, 'main.temp': 1})
+            temps = [doc['main']['temp'] for doc in cursor]
+            results = _interpolated_percentiles(temps, percentiles) if temps else None
+        if not results:
+            return "No temperature data available to calculate percentiles."
+        lines = [f"- {'Median' if percentile == 50 else f'P{percentile}'}: {value:.2f}°C"
+                 for percentile, value in results.items()]
+        return "Temperature percentiles across all cities:\n" + '\n'.join(lines)
+    except Exception as e:
+        logger.error("Failed to calculate temperature percentiles: %s", e)
+        return "Sorry, I couldn't calculate the temperature percentiles."
+
+def get_average_temperature_by_country(limit=10):
+    try:
+        snapshot = analytics_snapshot()
+        if snapshot is not None:
+            groups = snapshot.group_mean('temp')[:limit]
+        else:
+            pipeline = [
+                {"$match": {"main.temp": {"$type": "number"}}},
+                {"$group": {"_id": "$sys.country", "averageTemp": {"$avg": "$main.temp"}, "cities": {"$sum": 1}}},
+                {"$sort": {"averageTemp": -1, "_id": 1}},
+                {"$limit": limit},
+            ]
+            groups = [(doc['_id'], doc['averageTemp'], doc['cities'])
+                      for doc in get_analytics_db()['weather_data'].aggregate(pipeline)]
+        if not groups:
+            return "No temperature data available to group by country."
+        lines = [f"- **{country or 'Unknown'}**: {avg_temp:.2f}°C ({cities} cities)"
+                 for country, avg_temp, cities in groups]
+        return "Average temperature by country:\n" + '\n'.join(lines)
+    except Exception as e:
+        logger.error("Failed to calculate average temperature by country: %s", e)
+        return "Sorry, I couldn't calculate the average temperature by country."
+
 def get_visibility(city_name):
-    collection = db['weather_data']
+    collection = get_db()['weather_data']
+    city = locate_city(city_name)
+    # By name_key even for known cities, so the read stays covered
+    name_key = city.entry.name_key if city.entry is not None else normalize_city_name(city.query)
     try:
-        result = collection.find_one(
-            {'name': {'$regex': f'^{re.escape(city_name)}$', '$options': 'i'}}
-        )
-        if result and 'visibility' in result:
-            visibility = result['visibility']
-            print(f"[DEBUG] Retrieved visibility for {city_name}: {visibility} meters")
+        cached = weather_cache.get(name_key)
+        if cached is not None:
+            visibility = cached.visibility
+        else:
+            # Covered by the (name_key, visibility) index: no document is fetched
+            result = collection.find_one({'name_key': name_key}, {'_id': 0, 'visibility': 1})
+            visibility = result.get('visibility') if result else None
+        if visibility is not None:
+            logger.debug("Retrieved visibility for %s: %s meters", city_name, visibility)
             return f"The current visibility in {city_name} is {visibility} meters."
         else:
             return f"Visibility data for {city_name} is not available."
     except Exception as e:
-        print(f"[ERROR] Failed to retrieve visibility data: {e}")
+        logger.error("Failed to retrieve visibility data: %s", e)
         return "Sorry, I couldn't retrieve the visibility data."
 
 def update_city_data(city_name):
-    print(f"[DEBUG] Updating weather data for city: {city_name}")
-    error = update_weather_for_city(city_name)
+    logger.debug("Updating weather data for city: %s", city_name)
+    city = locate_city(city_name)
+    weather_cache.invalidate(city_lookup(city)[0])
+    error = update_weather_for_city(city_name, city)
     if error:
-        print(f"[ERROR] Error updating weather for city {city_name}: {error}")
+        logger.error("Error updating weather for city %s: %s", city_name, error)
         return f"Sorry, I couldn't update the weather data for **{city_name}**. {error}"
     else:
-        print(f"[DEBUG] Successfully updated weather data for city: {city_name}")
+        logger.debug("Successfully updated weather data for city: %s", city_name)
         return f"Weather data for **{city_name}** has been updated."
 
-def process_weather_request(message):
-    user_request = message.lower().strip()
-    print(f"[DEBUG] Processing weather request: {user_request}")
-
-    # Define patterns for different queries
-    patterns = {
-        'list_cities': r"^(list|show)\s+(all\s+)?(the\s+)?(cities|city)\s+(in|from)?\s+(the\s+)?database$",
-        'average_temperature': r"^(average|mean)\s+(temperature|temp)$",
-        'delete_city': r"^(delete|remove)\s+(?:the\s+)?(?:city\s+)?([\w\s,]+)$",
-        'update_city': r"^(update|refresh)\s+(?:the\s+city\s+of\s+)?(?:weather\s+data\s+for\s+)?([\w\s,]+)$",
-        'hottest_cities': r"^(hottest|warmest)\s+(cities|city)$",
-        'coldest_cities': r"^(coldest|coolest)\s+(cities|city)$",
-        'average_humidity': r"^(average|mean)\s+humidity$",
-        'visibility': r"^(visibility)\s*(?:in\s+([\w\s,]+))?$",
-        'weather_in_city': r"^(weather in|current weather in|what's the weather in|get weather for|show forecast for|get forecast for)\s+([\w\s,]+)$",
-        'forecast_in_city': r"^(forecast in|show forecast in|get forecast for)\s+([\w\s,]+)$",
-        'hottest': r"^(hottest)$",
-        'humidity': r"^(humidity)$",
-    }
-
-    # Match user request against patterns
-    for intent, pattern in patterns.items():
-        match = re.match(pattern, user_request)
-        if match:
-            if intent == 'list_cities':
-                print("[DEBUG] Detected request to list cities.")
-                return list_cities_in_database()
-            elif intent == 'average_temperature':
-                print("[DEBUG] Detected request for average temperature.")
-                return get_average_temperature()
-            elif intent == 'delete_city':
-                city_name = match.group(2).strip()
-                print(f"[DEBUG] Detected request to delete city: {city_name}")
-                return delete_city_data(city_name)
-            elif intent == 'update_city':
-                city_name = match.group(2).strip()
-                print(f"[DEBUG] Detected request to update city: {city_name}")
-                return update_city_data(city_name)
-            elif intent == 'hottest_cities':
-                print("[DEBUG] Detected request for hottest cities.")
-                return get_hottest_cities()
-            elif intent == 'coldest_cities':
-                print("[DEBUG] Detected request for coldest cities.")
-                return get_coldest_cities()
-            elif intent == 'average_humidity':
-                print("[DEBUG] Detected request for average humidity.")
-                return get_average_humidity()
-            elif intent == 'visibility':
-                city_name = match.group(2).strip() if match.group(2) else None
-                if city_name:
-                    print(f"[DEBUG] Detected request for visibility in city: {city_name}")
-                    return get_visibility(city_name)
-                else:
-                    # If city is not specified, provide average visibility or ask for city
-                    return "Please specify a city to get its visibility data."
-            elif intent == 'weather_in_city' or intent == 'forecast_in_city':
-                city_name = match.group(2).strip()
-                print(f"[DEBUG] Detected weather request for city: {city_name}")
-                weather_data = get_weather_from_db(city_name)
-                if not weather_data:
-                    print(f"[DEBUG] Weather data not found or outdated for city: {city_name}. Fetching new data.")
-                    error = update_weather_for_city(city_name)
-                    if error:
-                        print(f"[ERROR] Error updating weather for city {city_name}: {error}")
-                        return error
-                    weather_data = get_weather_from_db(city_name)
-                    if not weather_data:
-                        print(f"[ERROR] Could not fetch weather data for {city_name} after update.")
-                        return f"Sorry, I couldn't fetch weather data for **{city_name}**."
-                response = format_weather_response(weather_data)
-                print(f"[DEBUG] Generated response for city {city_name}.")
-                return response
-            elif intent == 'hottest':
-                print("[DEBUG] Detected request for hottest cities.")
-                return get_hottest_cities()
-            elif intent == 'humidity':
-                print("[DEBUG] Detected request for average humidity.")
-                return get_average_humidity()
-    
-    # If no patterns matched, attempt to extract city name for general weather queries
-    city_name = extract_city_name(user_request)
-    if city_name:
-        print(f"[DEBUG] Attempting to provide weather for city: {city_name}")
+def get_or_fetch_weather(city_name):
+    city = locate_city(city_name)
+    weather_data = get_weather_from_db(city_name, city)
+    if not weather_data:
+        logger.debug("Weather data not found or outdated for city: %s. Fetching new data.", city_name)
+        error = update_weather_for_city(city_name, city)
+        if error:
+            logger.error("Error updating weather for city %s: %s", city_name, error)
+            return error
+        # The gazetteer has learned which city the API answered the name with
         weather_data = get_weather_from_db(city_name)
         if not weather_data:
-            print(f"[DEBUG] Weather data not found or outdated for city: {city_name}. Fetching new data.")
-            error = update_weather_for_city(city_name)
-            if error:
-                print(f"[ERROR] Error updating weather for city {city_name}: {error}")
-                return error
-            weather_data = get_weather_from_db(city_name)
-            if not weather_data:
-                print(f"[ERROR] Could not fetch weather data for {city_name} after update.")
-                return f"Sorry, I couldn't fetch weather data for **{city_name}**."
-        response = format_weather_response(weather_data)
-        print(f"[DEBUG] Generated response for city {city_name}.")
-        return response
-    else:
-        # Handle unrecognized commands
-        print("[DEBUG] Unrecognized command.")
-        return "I'm sorry, I didn't understand your request. Could you please rephrase it?"
+            logger.error("Could not fetch weather data for %s after update.", city_name)
+            return f"Sorry, I couldn't fetch weather data for **{city_name}**."
+    response = format_weather_response(weather_data)
+    logger.debug("Generated response for city %s.", city_name)
+    return response
+
+def get_visibility_for_request(city_name):
+    if city_name:
+        return get_visibility(city_name)
+    # If city is not specified, ask for one
+    return "Please specify a city to get its visibility data."
+
+# Intent name -> handler taking the extracted city name (or None)
+INTENT_HANDLERS = {
+    'list_cities': lambda city_name: list_cities_in_database(),
+    'average_temperature': lambda city_name: get_average_temperature(),
+    'temperature_percentiles': lambda city_name: get_temperature_percentiles(),
+    'temperature_history': get_temperature_history,
+    'average_by_country': lambda city_name: get_average_temperature_by_country(),
+    'delete_city': delete_city_data,
+    'update_city': update_city_data,
+    'hottest_cities': lambda city_name: get_hottest_cities(),
+    'coldest_cities': lambda city_name: get_coldest_cities(),
+    'average_humidity': lambda city_name: get_average_humidity(),
+    'visibility': get_visibility_for_request,
+    'weather_in_city': get_or_fetch_weather,
+    'forecast_in_city': get_or_fetch_weather,
+    'hottest': lambda city_name: get_hottest_cities(),
+    'humidity': lambda city_name: get_average_humidity(),
+    'city_weather': get_or_fetch_weather,
+}
+
+def process_weather_request(message):
+    user_request = message.lower().strip()
+    logger.debug("Processing weather request: %s", user_request)
+
+    intent, city_name = match_intent(user_request)
+    if intent is None:
+        # If no patterns matched, attempt to extract city name for general weather queries
+        city_name = extract_city_name(user_request)
+        if not city_name:
+            # Handle unrecognized commands
+            logger.debug("Unrecognized command.")
+            return "I'm sorry, I didn't understand your request. Could you please rephrase it?"
+        intent = 'city_weather'
+
+    logger.debug("Detected intent '%s' for city: %s", intent, city_name)
+    response = INTENT_HANDLERS[intent](city_name)
+    if is_direct_intent(intent):
+        return final_response(response)
+    return response
 
 def transfer_back_to_router_agent(message):
-    print("[DEBUG] Transferring back to router agent.")
+    logger.debug("Transferring back to router agent.")
     from agents.router_agent import router_agent
     return router_agent
 
@@ -366,7 +612,9 @@ Capabilities:
 - Retrieve current weather data from the database and present it to the user.
 - Perform analytics on the collected weather data, providing insights such as:
   - Hottest/coldest cities
-  - Average temperatures
+  - Average temperatures, overall and by country
+  - Temperature percentiles
+  - Daily temperature history for a city
   - Average humidity
   - Wind speeds
   - Pressure readings
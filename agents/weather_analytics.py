@@ -1,123 +1,128 @@
 # agents/weather_analytics.py
 
 import re
-from utils.db_utils import db
+from pymongo import ASCENDING, DESCENDING
+from utils.db_utils import get_analytics_db, normalize_city_name
+from agents.weather_history import get_daily_history
+from agents.weather_stats import CITY_STATS_COLLECTION
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+CITY_STATS_PROJECTION = {'_id': 0, 'name': 1, 'temp_avg': 1}
 
 def process_weather_analytics(user_request):
     user_request_lower = user_request.lower()
-    print(f"[DEBUG] Processing weather analytics request: {user_request}")
+    logger.debug("Processing weather analytics request: %s", user_request)
 
     if "hottest" in user_request_lower:
-        print("[DEBUG] Analytics request for hottest cities.")
+        logger.debug("Analytics request for hottest cities.")
         return get_hottest_cities()
     elif "coldest" in user_request_lower:
-        print("[DEBUG] Analytics request for coldest cities.")
+        logger.debug("Analytics request for coldest cities.")
         return get_coldest_cities()
     elif "average temperature" in user_request_lower:
-        print("[DEBUG] Analytics request for average temperature.")
+        logger.debug("Analytics request for average temperature.")
         return get_average_temperature(user_request)
+    elif "history" in user_request_lower or "trend" in user_request_lower:
+        logger.debug("Analytics request for temperature history.")
+        match = re.search(r"(?:history|trend)\s+(?:for|in|of)\s+([\w\s,]+)", user_request_lower)
+        return get_temperature_history(match.group(1) if match else None)
     # ... (Include other condition checks and corresponding function calls)
     else:
-        print("[DEBUG] Analytics request not recognized.")
+        logger.debug("Analytics request not recognized.")
         return "Sorry, I didn't understand your analytics request."
 
 def get_hottest_cities():
-    print("[DEBUG] Calculating hottest cities.")
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$name",
-                "average_temp": {"$avg": "$main.temp"}
-            }
-        },
-        {"$sort": {"average_temp": -1}},
-        {"$limit": 5}
-    ]
+    logger.debug("Calculating hottest cities.")
     try:
-        results = db['weather_data'].aggregate(pipeline)
-        hottest_cities = [f"{res['_id']}: {res['average_temp']:.2f}°C" for res in results]
+        results = get_analytics_db()[CITY_STATS_COLLECTION].find({}, CITY_STATS_PROJECTION).sort('temp_avg', DESCENDING).limit(5)
+        hottest_cities = [f"{res['name']}: {res['temp_avg']:.2f}°C" for res in results]
         if not hottest_cities:
-            print("[DEBUG] No weather data available for hottest cities.")
+            logger.debug("No weather data available for hottest cities.")
             return "No weather data available."
         response = "Top 5 hottest cities based on average temperature:\n" + "\n".join(hottest_cities)
-        print("[DEBUG] Hottest cities calculated.")
+        logger.debug("Hottest cities calculated.")
         return response
     except Exception as e:
-        print(f"[ERROR] Failed to calculate hottest cities: {e}")
+        logger.error("Failed to calculate hottest cities: %s", e)
         return "An error occurred while calculating the hottest cities."
 
 def get_coldest_cities():
-    print("[DEBUG] Calculating coldest cities.")
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$name",
-                "average_temp": {"$avg": "$main.temp"}
-            }
-        },
-        {"$sort": {"average_temp": 1}},
-        {"$limit": 5}
-    ]
+    logger.debug("Calculating coldest cities.")
     try:
-        results = db['weather_data'].aggregate(pipeline)
-        coldest_cities = [f"{res['_id']}: {res['average_temp']:.2f}°C" for res in results]
+        results = get_analytics_db()[CITY_STATS_COLLECTION].find({}, CITY_STATS_PROJECTION).sort('temp_avg', ASCENDING).limit(5)
+        coldest_cities = [f"{res['name']}: {res['temp_avg']:.2f}°C" for res in results]
         if not coldest_cities:
-            print("[DEBUG] No weather data available for coldest cities.")
+            logger.debug("No weather data available for coldest cities.")
             return "No weather data available."
         response = "Top 5 coldest cities based on average temperature:\n" + "\n".join(coldest_cities)
-        print("[DEBUG] Coldest cities calculated.")
+        logger.debug("Coldest cities calculated.")
         return response
     except Exception as e:
-        print(f"[ERROR] Failed to calculate coldest cities: {e}")
+        logger.error("Failed to calculate coldest cities: %s", e)
         return "An error occurred while calculating the coldest cities."
 
 def get_average_temperature(user_request):
-    print("[DEBUG] Calculating average temperature.")
+    logger.debug("Calculating average temperature.")
     match = re.search(r"average temperature in ([\w\s,]+)", user_request.lower())
+    city_stats = get_analytics_db()[CITY_STATS_COLLECTION]
     try:
         if match:
             city_name = match.group(1).strip()
-            print(f"[DEBUG] Calculating average temperature for city: {city_name}")
-            pipeline = [
-                {"$match": {"name": {'$regex': f'^{city_name}$', '$options': 'i'}}},
-                {
-                    "$group": {
-                        "_id": "$name",
-                        "average_temp": {"$avg": "$main.temp"}
-                    }
-                }
-            ]
-            results = list(db['weather_data'].aggregate(pipeline))
-            if results:
-                avg_temp = results[0]['average_temp']
+            logger.debug("Calculating average temperature for city: %s", city_name)
+            result = city_stats.find_one({'name_key': normalize_city_name(city_name)}, CITY_STATS_PROJECTION)
+            if result:
+                avg_temp = result['temp_avg']
                 response = f"The average temperature in {city_name.title()} is {avg_temp:.2f}°C."
-                print("[DEBUG] Average temperature calculated.")
+                logger.debug("Average temperature calculated.")
                 return response
             else:
-                print(f"[DEBUG] No weather data available for {city_name.title()}.")
+                logger.debug("No weather data available for %s.", city_name.title())
                 return f"No weather data available for {city_name.title()}."
         else:
-            print("[DEBUG] Calculating average temperature across all cities.")
+            logger.debug("Calculating average temperature across all cities.")
+            # One document per city, so this stays flat as observation history grows
             pipeline = [
                 {
                     "$group": {
                         "_id": None,
-                        "average_temp": {"$avg": "$main.temp"}
+                        "temp_sum": {"$sum": "$temp_sum"},
+                        "count": {"$sum": "$count"}
                     }
                 }
             ]
-            results = list(db['weather_data'].aggregate(pipeline))
-            if results:
-                avg_temp = results[0]['average_temp']
+            results = list(city_stats.aggregate(pipeline))
+            if results and results[0]['count']:
+                avg_temp = results[0]['temp_sum'] / results[0]['count']
                 response = f"The average temperature across all recorded cities is {avg_temp:.2f}°C."
-                print("[DEBUG] Average temperature calculated.")
+                logger.debug("Average temperature calculated.")
                 return response
             else:
-                print("[DEBUG] No weather data available.")
+                logger.debug("No weather data available.")
                 return "No weather data available."
     except Exception as e:
-        print(f"[ERROR] Failed to calculate average temperature: {e}")
+        logger.error("Failed to calculate average temperature: %s", e)
         return "An error occurred while calculating the average temperature."
 
+def get_temperature_history(city_name):
+    logger.debug("Calculating temperature history.")
+    if not city_name:
+        return "Please specify a city to get its temperature history."
+    city_name = city_name.strip()
+    try:
+        stats = get_analytics_db()[CITY_STATS_COLLECTION].find_one({'name_key': normalize_city_name(city_name)}, {'_id': 1})
+        days = get_daily_history(stats['_id']) if stats else []
+        if not days:
+            logger.debug("No temperature history available for %s.", city_name.title())
+            return f"No temperature history available for {city_name.title()}."
+        lines = [f"{day['bucket']:%Y-%m-%d}: avg {day['temp_avg']:.2f}°C "
+                 f"(min {day['temp_min']:.2f}°C, max {day['temp_max']:.2f}°C)" for day in days]
+        logger.debug("Temperature history calculated.")
+        return f"Daily temperatures in {city_name.title()}:\n" + "\n".join(lines)
+    except Exception as e:
+        logger.error("Failed to calculate temperature history: %s", e)
+        return "An error occurred while retrieving the temperature history."
+
 # ... (Add minimal debugging to other analytics functions in a similar manner)
 
@@ -0,0 +1,266 @@
+# agents/weather_async.py
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING
+import aiohttp
+from utils.db_utils import MAX_QUERY_BYTES, MAX_QUERY_ROWS, QUERY_PAGE_SIZE, analytics_read_preference, normalize_city_name
+from utils.async_runtime import get_http_session, get_motor_db
+from utils.weather_client import OPEN_WEATHER_BASE_URL, RETRY_STATUSES, LatencyStats, backoff_delay, retry_after_delay
+from agents.weather_agent import (
+    WEATHER_RECORD_PROJECTION,
+    city_lookup,
+    correct_city_name,
+    format_weather_response,
+    learn_city,
+    locate_city,
+    remaining_freshness,
+    weather_cache,
+    weather_follow_up_failed,
+    weather_record,
+    weather_stored,
+    weather_write_outcome,
+    weather_writes,
+)
+from agents.city_gazetteer import loaded_gazetteer
+from agents.weather_stats import CITY_STATS_COLLECTION
+from utils.instrumentation import get_logger, observe_span
+
+logger = get_logger(__name__)
+
+# Async counterparts of the data and API layer. They share the process-wide
+# event loop, Motor client and aiohttp session from utils.async_runtime, and
+# the same cache, upsert builders and response formats as the sync code.
+
+MAX_RETRIES = int(os.getenv('WEATHER_API_MAX_RETRIES', '3'))
+BACKOFF_FACTOR = float(os.getenv('WEATHER_API_BACKOFF_FACTOR', '0.5'))
+BACKOFF_MAX = float(os.getenv('WEATHER_API_BACKOFF_MAX', '30'))
+
+api_latency = LatencyStats()
+_inflight_updates = {}
+
+async def run_mongodb_query_async(collection_name, query, projection=None, max_rows=MAX_QUERY_ROWS,
+                                  max_bytes=MAX_QUERY_BYTES):
+    db = await get_motor_db()
+    cursor = db[collection_name].find(query, projection, limit=max_rows + 1, batch_size=QUERY_PAGE_SIZE)
+    cursor = cursor.sort('_id', ASCENDING)
+    parts = []
+    rows = 0
+    size = 0
+    truncated = False
+    async for record in cursor:
+        if rows >= max_rows:
+            truncated = True
+            break
+        record.pop('_id', None)
+        line = str(record) + "\n"
+        if size + len(line) > max_bytes:
+            truncated = True
+            break
+        parts.append(line)
+        rows += 1
+        size += len(line)
+    await cursor.close()
+
+    if not parts:
+        return "No results found."
+    if truncated:
+        parts.append(f"... (output truncated after {rows} records)\n")
+    return "".join(parts)
+
+async def request_weather_api_async(endpoint, params):
+    api_key = os.getenv('OPEN_WEATHER_API')
+    if not api_key:
+        logger.error("OpenWeatherMap API key is not set.")
+        return None, "OpenWeatherMap API key is not set."
+    base_url = os.getenv('OPEN_WEATHER_BASE_URL', OPEN_WEATHER_BASE_URL).rstrip('/')
+    url = f"{base_url}/{endpoint.lstrip('/')}"
+    params = {key: str(value) for key, value in dict(params, units='metric').items()}
+    logger.debug("Fetching weather data from '%s' with params: %s", endpoint, params)
+    params['appid'] = api_key
+    session = await get_http_session()
+
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            async with session.get(url, params=params) as response:
+                retryable = response.status in RETRY_STATUSES
+                elapsed = time.perf_counter() - start
+                api_latency.record(elapsed, error=retryable)
+                observe_span('http', endpoint, elapsed, error=retryable)
+                if not retryable or attempt >= MAX_RETRIES:
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError as e:
+                        logger.error("Request failed: %s", e)
+                        return None, f"Request failed: {e}"
+                    if response.status != 200:
+                        error_message = data.get('message', 'Error fetching weather data.')
+                        logger.error("API Error: %s", error_message)
+                        return None, f"API Error: {error_message}"
+                    return data, None
+                delay = retry_after_delay(response.headers.get('Retry-After'), BACKOFF_MAX)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            elapsed = time.perf_counter() - start
+            api_latency.record(elapsed, error=True)
+            observe_span('http', endpoint, elapsed, error=True)
+            if attempt >= MAX_RETRIES:
+                logger.error("Request failed: %s", e)
+                return None, f"Request failed: {e}"
+            delay = None
+        if delay is None:
+            delay = backoff_delay(attempt, BACKOFF_FACTOR, BACKOFF_MAX)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+async def locate_city_async(city_name):
+    if loaded_gazetteer() is not None:
+        # Stale gazetteers reload on their own thread, so resolving never blocks
+        return locate_city(city_name)
+    # The first load scans weather_data with pymongo; keep it off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, locate_city, city_name)
+
+async def fetch_weather_data_async(city_name):
+    return await request_weather_api_async('weather', {'q': city_name})
+
+async def fetch_weather_by_id_async(city_id):
+    return await request_weather_api_async('weather', {'id': city_id})
+
+async def store_weather_data_async(weather_data):
+    return await store_weather_data_many_async([weather_data])
+
+async def store_weather_data_many_async(payloads):
+    if not payloads:
+        return 0, None
+    db = await get_motor_db()
+    writes = weather_writes(payloads, datetime.utcnow())
+    try:
+        written, error = weather_write_outcome(await db['weather_data'].bulk_write(writes.pop('weather_data'),
+                                                                                    ordered=False))
+    except Exception as e:
+        written, error = weather_write_outcome(exception=e)
+    if not written:
+        return written, error
+    weather_stored(payloads)
+    results = await asyncio.gather(
+        *(db[collection_name].bulk_write(operations, ordered=False) for collection_name, operations in writes.items()),
+        return_exceptions=True,
+    )
+    for collection_name, result in zip(writes, results):
+        if isinstance(result, Exception):
+            weather_follow_up_failed(collection_name, result)
+    return written, error
+
+async def update_weather_for_city_async(city_name, city=None):
+    # Single-flight on the event loop: later callers await the leader's task
+    city = city or await locate_city_async(city_name)
+    key = f'id:{city.entry.id}' if city.entry is not None else normalize_city_name(city.query)
+    task = _inflight_updates.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_update_weather_for_city_async(city))
+        _inflight_updates[key] = task
+        task.add_done_callback(lambda _: _inflight_updates.pop(key, None))
+    return await asyncio.shield(task)
+
+async def _update_weather_for_city_async(city):
+    if city.entry is not None:
+        weather_data, error = await fetch_weather_by_id_async(city.entry.id)
+    else:
+        weather_data, error = await fetch_weather_data_async(city.query)
+        corrected = correct_city_name(city.query) if error else None
+        if corrected is not None and corrected.entry is not None:
+            weather_data, error = await fetch_weather_by_id_async(corrected.entry.id)
+    if error:
+        return error
+    await store_weather_data_async(weather_data)
+    if city.entry is None:
+        learn_city(city.query, weather_data)
+    return None
+
+async def get_weather_from_db_async(city_name, city=None):
+    cache_key, query = city_lookup(city or await locate_city_async(city_name))
+    cached = weather_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    db = await get_motor_db()
+    try:
+        result = await db['weather_data'].find_one(query, WEATHER_RECORD_PROJECTION)
+        if not result:
+            return None
+        record = weather_record(result)
+        freshness = remaining_freshness(record)
+        if freshness < timedelta(0):
+            return None
+        weather_cache.set(cache_key, record, ttl=freshness.total_seconds())
+        return record
+    except Exception as e:
+        logger.error("Failed to retrieve weather data from database: %s", e)
+        return None
+
+async def get_or_fetch_weather_async(city_name):
+    city = await locate_city_async(city_name)
+    weather_data = await get_weather_from_db_async(city_name, city)
+    if not weather_data:
+        error = await update_weather_for_city_async(city_name, city)
+        if error:
+            return error
+        weather_data = await get_weather_from_db_async(city_name)
+        if not weather_data:
+            return f"Sorry, I couldn't fetch weather data for **{city_name}**."
+    return format_weather_response(weather_data)
+
+async def _top_cities_by_average(direction, limit=5):
+    db = (await get_motor_db()).with_options(read_preference=analytics_read_preference())
+    cursor = db[CITY_STATS_COLLECTION].find({}, {'_id': 0, 'name': 1, 'temp_avg': 1})
+    return await cursor.sort('temp_avg', direction).limit(limit).to_list(limit)
+
+async def get_hottest_cities_async():
+    try:
+        results = await _top_cities_by_average(DESCENDING)
+        if not results:
+            return "No weather data available."
+        return "Top 5 hottest cities based on average temperature:\n" + "\n".join(
+            f"{res['name']}: {res['temp_avg']:.2f}°C" for res in results)
+    except Exception as e:
+        logger.error("Failed to calculate hottest cities: %s", e)
+        return "An error occurred while calculating the hottest cities."
+
+async def get_coldest_cities_async():
+    try:
+        results = await _top_cities_by_average(ASCENDING)
+        if not results:
+            return "No weather data available."
+        return "Top 5 coldest cities based on average temperature:\n" + "\n".join(
+            f"{res['name']}: {res['temp_avg']:.2f}°C" for res in results)
+    except Exception as e:
+        logger.error("Failed to calculate coldest cities: %s", e)
+        return "An error occurred while calculating the coldest cities."
+
+async def _average_of(field):
+    db = (await get_motor_db()).with_options(read_preference=analytics_read_preference())
+    pipeline = [{"$group": {"_id": None, "average": {"$avg": f"${field}"}}}]
+    results = await db[CITY_STATS_COLLECTION].aggregate(pipeline).to_list(1)
+    return results[0]['average'] if results else None
+
+async def get_average_temperature_async():
+    try:
+        avg_temp = await _average_of('temp_last')
+        if avg_temp is None:
+            return "No temperature data available to calculate average."
+        return f"The average temperature among all cities is {avg_temp:.2f}°C."
+    except Exception as e:
+        logger.error("Failed to calculate average temperature: %s", e)
+        return "Sorry, I couldn't calculate the average temperature."
+
+async def get_average_humidity_async():
+    try:
+        avg_humidity = await _average_of('humidity_last')
+        if avg_humidity is None:
+            return "No humidity data available to calculate average."
+        return f"The average humidity across all cities is {avg_humidity:.2f}%."
+    except Exception as e:
+        logger.error("Failed to calculate average humidity: %s", e)
+        return "Sorry, I couldn't calculate the average humidity."
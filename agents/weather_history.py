@@ -0,0 +1,126 @@
+# agents/weather_history.py
+
+import os
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, IndexModel
+from utils.db_utils import get_analytics_db, get_db
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+HISTORY_COLLECTION = 'weather_history'
+HISTORY_RETENTION = timedelta(days=int(os.getenv('WEATHER_HISTORY_RETENTION_DAYS', '30')))
+
+# Downsampled rollups outlive the raw observations they are built from
+ROLLUP_COLLECTIONS = {
+    'hour': 'weather_history_hourly',
+    'day': 'weather_history_daily',
+}
+ROLLUP_RETENTION = {
+    'hour': timedelta(days=int(os.getenv('WEATHER_HOURLY_RETENTION_DAYS', '90'))),
+    'day': timedelta(days=int(os.getenv('WEATHER_DAILY_RETENTION_DAYS', '730'))),
+}
+
+def _create_history_collection(db, retention_seconds):
+    db.create_collection(
+        HISTORY_COLLECTION,
+        timeseries={'timeField': 'time', 'metaField': 'meta', 'granularity': 'hours'},
+        expireAfterSeconds=retention_seconds,
+    )
+    logger.debug("Created time-series collection %s.", HISTORY_COLLECTION)
+
+def _convert_history_collection(db, retention_seconds, batch_size=1000):
+    # A writer that ran before ensure_weather_history left a regular
+    # collection behind; move its observations into a time-series one
+    legacy_name = f'{HISTORY_COLLECTION}_legacy'
+    db[HISTORY_COLLECTION].rename(legacy_name, dropTarget=True)
+    _create_history_collection(db, retention_seconds)
+    cutoff = datetime.utcnow() - HISTORY_RETENTION
+    batch, copied = [], 0
+    for document in db[legacy_name].find({'time': {'$gte': cutoff}, 'meta': {'$ne': None}}, {'_id': 0}):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            copied += len(db[HISTORY_COLLECTION].insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+    if batch:
+        copied += len(db[HISTORY_COLLECTION].insert_many(batch, ordered=False).inserted_ids)
+    db.drop_collection(legacy_name)
+    logger.warning("Converted %s to a time-series collection, keeping %s observations.", HISTORY_COLLECTION, copied)
+
+def ensure_weather_history():
+    db = get_db()
+    retention_seconds = int(HISTORY_RETENTION.total_seconds())
+    info = next(db.list_collections(filter={'name': HISTORY_COLLECTION}), None)
+    if info is None:
+        _create_history_collection(db, retention_seconds)
+    elif info.get('type') != 'timeseries':
+        _convert_history_collection(db, retention_seconds)
+    else:
+        db.command('collMod', HISTORY_COLLECTION, expireAfterSeconds=retention_seconds)
+
+    for unit, collection_name in ROLLUP_COLLECTIONS.items():
+        db[collection_name].create_indexes([
+            IndexModel([('city_id', ASCENDING), ('bucket', ASCENDING)], name='city_bucket'),
+            IndexModel([('bucket', ASCENDING)], name='bucket_ttl',
+                       expireAfterSeconds=int(ROLLUP_RETENTION[unit].total_seconds())),
+        ])
+
+def history_document(weather_data):
+    main = weather_data.get('main', {})
+    return {
+        'time': datetime.utcfromtimestamp(weather_data['dt']),
+        'meta': weather_data['id'],
+        'temp': main.get('temp'),
+        'humidity': main.get('humidity'),
+        'pressure': main.get('pressure'),
+        'wind_speed': weather_data.get('wind', {}).get('speed'),
+        'visibility': weather_data.get('visibility'),
+    }
+
+def downsample_weather_history(unit='hour', since=None):
+    if unit not in ROLLUP_COLLECTIONS:
+        raise ValueError(f"Unsupported rollup unit: {unit}")
+    if since is None:
+        # Recompute the current and previous bucket; older ones are already final
+        now = datetime.utcnow()
+        if unit == 'hour':
+            since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        else:
+            since = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+    pipeline = [
+        {'$match': {'time': {'$gte': since}}},
+        # Refreshing the same observation twice stores it twice; count it once
+        {'$group': {
+            '_id': {'city_id': '$meta', 'time': '$time'},
+            'temp': {'$first': '$temp'},
+            'humidity': {'$first': '$humidity'},
+            'pressure': {'$first': '$pressure'},
+            'wind_speed': {'$first': '$wind_speed'},
+        }},
+        {'$group': {
+            '_id': {
+                'city_id': '$_id.city_id',
+                'bucket': {'$dateTrunc': {'date': '$_id.time', 'unit': unit}},
+            },
+            'samples': {'$sum': 1},
+            'temp_avg': {'$avg': '$temp'},
+            'temp_min': {'$min': '$temp'},
+            'temp_max': {'$max': '$temp'},
+            'humidity_avg': {'$avg': '$humidity'},
+            'pressure_avg': {'$avg': '$pressure'},
+            'wind_speed_avg': {'$avg': '$wind_speed'},
+        }},
+        {'$set': {'city_id': '$_id.city_id', 'bucket': '$_id.bucket'}},
+        {'$merge': {'into': ROLLUP_COLLECTIONS[unit], 'whenMatched': 'replace'}},
+    ]
+    get_db()[HISTORY_COLLECTION].aggregate(pipeline, allowDiskUse=True)
+    logger.debug("Downsampled weather history into %s since %s.", ROLLUP_COLLECTIONS[unit], since)
+
+def get_daily_history(city_id, days=7):
+    since = datetime.utcnow() - timedelta(days=days)
+    cursor = get_analytics_db()[ROLLUP_COLLECTIONS['day']].find(
+        {'city_id': city_id, 'bucket': {'$gte': since}},
+        {'_id': 0, 'bucket': 1, 'temp_avg': 1, 'temp_min': 1, 'temp_max': 1, 'samples': 1},
+    ).sort('bucket', ASCENDING)
+    return list(cursor)
@@ -0,0 +1,76 @@
+# agents/weather_intents.py
+
+import re
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Ordered by priority: the first pattern that matches the whole request wins.
+# A named group called "city" captures the city for intents that take one.
+INTENT_PATTERNS = (
+    ('list_cities', r"(?:list|show)\s+(?:all\s+)?(?:the\s+)?(?:cities|city)\s+(?:in|from)?\s+(?:the\s+)?database"),
+    ('average_by_country', r"(?:average|mean)\s+(?:temperature|temp)\s+(?:by|per)\s+country"),
+    ('temperature_percentiles', r"(?:temperature|temp)\s+(?:percentiles?|distribution|median)"),
+    ('temperature_history', r"(?:(?:temperature|temp)\s+)?(?:history|trend)\s+(?:for|in|of)\s+(?P<city>[\w\s,]+)"),
+    ('average_temperature', r"(?:average|mean)\s+(?:temperature|temp)"),
+    ('delete_city', r"(?:delete|remove)\s+(?:the\s+)?(?:city\s+)?(?P<city>[\w\s,]+)"),
+    ('update_city', r"(?:update|refresh)\s+(?:the\s+city\s+of\s+)?(?:weather\s+data\s+for\s+)?(?P<city>[\w\s,]+)"),
+    ('hottest_cities', r"(?:hottest|warmest)\s+(?:cities|city)"),
+    ('coldest_cities', r"(?:coldest|coolest)\s+(?:cities|city)"),
+    ('average_humidity', r"(?:average|mean)\s+humidity"),
+    ('visibility', r"visibility\s*(?:in\s+(?P<city>[\w\s,]+))?"),
+    ('weather_in_city', r"(?:weather in|current weather in|what's the weather in|get weather for|show forecast for|get forecast for)\s+(?P<city>[\w\s,]+)"),
+    ('forecast_in_city', r"(?:forecast in|show forecast in|get forecast for)\s+(?P<city>[\w\s,]+)"),
+    ('hottest', r"hottest"),
+    ('humidity', r"humidity"),
+)
+
+def _compile_intents(patterns):
+    # Group names must be unique across the alternation, so each intent's
+    # city group is renamed to "<intent>__city"
+    alternatives = []
+    city_groups = {}
+    for intent, pattern in patterns:
+        if '(?P<city>' in pattern:
+            city_groups[intent] = f'{intent}__city'
+            pattern = pattern.replace('(?P<city>', f'(?P<{intent}__city>')
+        alternatives.append(f'(?P<{intent}>{pattern})')
+    return re.compile('|'.join(alternatives)), city_groups
+
+INTENT_REGEX, _CITY_GROUPS = _compile_intents(INTENT_PATTERNS)
+
+_CITY_PREFIXES = (
+    re.compile(r"\s+from\s+(?:the\s+)?(?:database|weather database)$"),
+    re.compile(r"^(update|refresh)\s+(?:the\s+city\s+of\s+)?(?:weather\s+data\s+for\s+)?"),
+    re.compile(r"^(get|show|provide)\s+(?:the\s+)?(?:current\s+)?weather\s+for\s+"),
+    re.compile(r"^(get|show|provide)\s+(?:the\s+)?forecast\s+for\s+"),
+)
+_CITY_NAME = re.compile(r"[\w\s,]+")
+
+def match_intent(user_request):
+    match = INTENT_REGEX.fullmatch(user_request)
+    if not match:
+        return None, None
+    # The outer intent group is the last one to close, so lastgroup names it
+    intent = match.lastgroup
+    city_group = _CITY_GROUPS.get(intent)
+    city_name = match.group(city_group) if city_group else None
+    return intent, city_name.strip() if city_name else None
+
+def extract_city_name(user_request):
+    user_request = user_request.lower().strip()
+    logger.debug("Extracting city name from user request: %s", user_request)
+
+    # Remove phrases like 'from database' or 'weather data for'
+    for prefix in _CITY_PREFIXES:
+        user_request = prefix.sub("", user_request)
+
+    # Attempt to extract city name
+    match = _CITY_NAME.fullmatch(user_request)
+    if match:
+        city_name = match.group(0).strip()
+        logger.debug("Extracted city name: %s", city_name)
+        return city_name
+    else:
+        logger.debug("Could not extract city name.")
+        return None
@@ -0,0 +1,94 @@
+# agents/weather_refresh.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.db_utils import get_db, normalize_city_name
+from agents.weather_agent import (
+    fetch_weather_by_id,
+    fetch_weather_data,
+    request_weather_api,
+    store_weather_data_many,
+)
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+GROUP_BATCH_SIZE = 20  # OpenWeatherMap caps the group endpoint at 20 city ids
+REFRESH_WORKERS = int(os.getenv('WEATHER_REFRESH_WORKERS', '16'))
+
+def get_tracked_cities():
+    city_ids, city_names = [], []
+    seen_ids, seen_names = set(), set()
+    for doc in get_db()['weather_data'].find({}, {'_id': 0, 'id': 1, 'name': 1}):
+        city_id = doc.get('id')
+        if city_id is not None:
+            if city_id not in seen_ids:
+                seen_ids.add(city_id)
+                city_ids.append(city_id)
+        elif doc.get('name'):
+            key = normalize_city_name(doc['name'])
+            if key not in seen_names:
+                seen_names.add(key)
+                city_names.append(doc['name'])
+    return city_ids, city_names
+
+def fetch_weather_group(city_ids):
+    data, error = request_weather_api('group', {'id': ','.join(str(i) for i in city_ids)})
+    if error:
+        return [], error
+    return data.get('list', []), None
+
+def _fetch_id_batch(city_ids):
+    payloads, error = fetch_weather_group(city_ids)
+    if not error:
+        return payloads, []
+    # Fall back to one call per city when the group endpoint is unavailable
+    logger.debug("Group fetch failed (%s); fetching %s cities individually.", error, len(city_ids))
+    payloads, errors = [], []
+    for city_id in city_ids:
+        data, error = fetch_weather_by_id(city_id)
+        if error:
+            errors.append(f"{city_id}: {error}")
+        else:
+            payloads.append(data)
+    return payloads, errors
+
+def _fetch_name(city_name):
+    data, error = fetch_weather_data(city_name)
+    if error:
+        return [], [f"{city_name}: {error}"]
+    return [data], []
+
+def refresh_all_cities(city_names=None, workers=REFRESH_WORKERS):
+    start = time.perf_counter()
+    if city_names is None:
+        city_ids, city_names = get_tracked_cities()
+    else:
+        city_ids = []
+    logger.debug("Refreshing %s cities by id and %s by name.", len(city_ids), len(city_names))
+
+    batches = [city_ids[i:i + GROUP_BATCH_SIZE] for i in range(0, len(city_ids), GROUP_BATCH_SIZE)]
+    payloads, errors = [], []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_fetch_id_batch, batch) for batch in batches]
+        futures += [pool.submit(_fetch_name, name) for name in city_names]
+        for future in as_completed(futures):
+            batch_payloads, batch_errors = future.result()
+            payloads.extend(batch_payloads)
+            errors.extend(batch_errors)
+
+    written, error = store_weather_data_many(payloads)
+    if error:
+        errors.append(error)
+
+    summary = {
+        'requested': len(city_ids) + len(city_names),
+        'fetched': len(payloads),
+        'written': written,
+        'errors': errors,
+        'elapsed': time.perf_counter() - start,
+    }
+    logger.debug("Refresh finished: %s fetched, %s written, %s errors in %.2fs.",
+                 summary['fetched'], written, len(errors), summary['elapsed'])
+    return summary
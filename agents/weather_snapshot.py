@@ -0,0 +1,316 @@
+# agents/weather_snapshot.py
+
+import os
+import threading
+import time
+import numpy as np
+from utils.db_utils import get_analytics_db, normalize_city_name
+from utils.instrumentation import get_logger, observe_span
+
+logger = get_logger(__name__)
+
+# Columnar copy of weather_data for analytics. Queries run as vectorized NumPy
+# operations instead of decoding whole documents; the copy is refreshed from
+# the modified_at watermark and reloaded in full periodically to drop deletes
+# made by other processes.
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv('WEATHER_SNAPSHOT_REFRESH_SECONDS', '5'))
+SNAPSHOT_RELOAD_SECONDS = float(os.getenv('WEATHER_SNAPSHOT_RELOAD_SECONDS', '3600'))
+# While a change stream feeds the snapshot, polling is only a safety net
+SNAPSHOT_STREAMING_REFRESH_SECONDS = float(os.getenv('WEATHER_SNAPSHOT_STREAMING_REFRESH_SECONDS', '300'))
+SNAPSHOT_BATCH_SIZE = 10000
+
+NUMERIC_COLUMNS = ('temp', 'humidity', 'pressure', 'wind_speed', 'visibility')
+
+# Only the analysed fields are sent by the server and decoded by the driver
+SNAPSHOT_PROJECTION = {
+    '_id': 0, 'id': 1, 'name': 1, 'name_key': 1, 'dt': 1, 'modified_at': 1, 'visibility': 1,
+    'main.temp': 1, 'main.humidity': 1, 'main.pressure': 1, 'wind.speed': 1, 'sys.country': 1,
+}
+
+def _number(value):
+    return np.nan if value is None else float(value)
+
+def snapshot_row(doc):
+    main = doc.get('main') or {}
+    name = doc.get('name')
+    return (
+        doc['id'],
+        name,
+        doc.get('name_key') or normalize_city_name(name or ''),
+        (doc.get('sys') or {}).get('country'),
+        doc.get('dt') or 0,
+        _number(main.get('temp')),
+        _number(main.get('humidity')),
+        _number(main.get('pressure')),
+        _number((doc.get('wind') or {}).get('speed')),
+        _number(doc.get('visibility')),
+    )
+
+class WeatherSnapshot:
+    def __init__(self, collection=None, refresh_seconds=SNAPSHOT_REFRESH_SECONDS,
+                 reload_seconds=SNAPSHOT_RELOAD_SECONDS):
+        self._collection = collection
+        self.refresh_seconds = refresh_seconds
+        self.reload_seconds = reload_seconds
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self.watermark = None
+        self.refreshed_at = 0.0
+        self.reloaded_at = 0.0
+        self._reload_requested = False
+        self._allocate(0)
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            return get_analytics_db()['weather_data']
+        return self._collection
+
+    def _allocate(self, capacity):
+        self.size = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.dt = np.empty(capacity, dtype=np.int64)
+        self.names = np.empty(capacity, dtype=object)
+        self.name_keys = np.empty(capacity, dtype=object)
+        # Countries are dictionary-encoded so group-bys are a bincount over codes
+        self.country_codes = np.empty(capacity, dtype=np.int32)
+        self.country_names = []
+        self._country_index = {}
+        self.columns = {name: np.empty(capacity, dtype=np.float64) for name in NUMERIC_COLUMNS}
+        self._rows = {}  # city id -> row; names are not unique, so nothing is keyed on them
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+
+        def grown(array):
+            resized = np.empty(capacity, dtype=array.dtype)
+            resized[:self.size] = array[:self.size]
+            return resized
+
+        self.ids = grown(self.ids)
+        self.dt = grown(self.dt)
+        self.names = grown(self.names)
+        self.name_keys = grown(self.name_keys)
+        self.country_codes = grown(self.country_codes)
+        self.columns = {name: grown(column) for name, column in self.columns.items()}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def loaded(self):
+        return self.reloaded_at > 0
+
+    def _set_row(self, row, values):
+        city_id, name, name_key, country, dt, *numbers = values
+        self.ids[row] = city_id
+        self.names[row] = name
+        self.name_keys[row] = name_key
+        code = self._country_index.get(country)
+        if code is None:
+            code = self._country_index[country] = len(self.country_names)
+            self.country_names.append(country)
+        self.country_codes[row] = code
+        self.dt[row] = dt
+        for column, value in zip(NUMERIC_COLUMNS, numbers):
+            self.columns[column][row] = value
+
+    def _upsert_row(self, values):
+        row = self._rows.get(values[0])
+        if row is None:
+            self._grow(self.size + 1)
+            row = self._rows[values[0]] = self.size
+            self.size += 1
+        self._set_row(row, values)
+
+    def _replace(self, rows):
+        # Column-at-a-time construction for full reloads; ids are unique in
+        # weather_data, so no per-row upsert bookkeeping is needed
+        self._allocate(0)
+        if not rows:
+            return
+        table = np.array(rows, dtype=object)
+        self.size = len(rows)
+        self.ids = table[:, 0].astype(np.int64)
+        self.names = table[:, 1].copy()
+        self.name_keys = table[:, 2].copy()
+        self.dt = table[:, 4].astype(np.int64)
+        self.columns = {column: table[:, 5 + i].astype(np.float64) for i, column in enumerate(NUMERIC_COLUMNS)}
+        index = self._country_index
+        self.country_codes = np.array([index.setdefault(country, len(index)) for country in table[:, 3]],
+                                      dtype=np.int32)
+        self.country_names = list(index)
+        self._rows = {city_id: row for row, city_id in enumerate(self.ids.tolist())}
+
+    def upsert(self, documents):
+        # Write-through from this process; the watermark is left alone so
+        # earlier writes from other processes are still picked up by refresh()
+        rows = [snapshot_row(doc) for doc in documents if doc.get('id') is not None]
+        with self._lock:
+            for values in rows:
+                self._upsert_row(values)
+
+    def remove(self, city_id):
+        with self._lock:
+            row = self._rows.pop(city_id, None)
+            if row is None:
+                return False
+            # Move the last row into the gap so the live rows stay contiguous
+            last = self.size - 1
+            if row != last:
+                country = self.country_names[self.country_codes[last]]
+                self._set_row(row, (self.ids[last], self.names[last], self.name_keys[last], country,
+                                    self.dt[last], *(self.columns[column][last] for column in NUMERIC_COLUMNS)))
+                self._rows[int(self.ids[row])] = row
+            self.size = last
+            return True
+
+    def _load(self, cursor, full):
+        rows = []
+        watermark = None if full else self.watermark
+        for doc in cursor:
+            if doc.get('id') is None:
+                continue
+            rows.append(snapshot_row(doc))
+            modified_at = doc.get('modified_at')
+            if modified_at is not None and (watermark is None or modified_at > watermark):
+                watermark = modified_at
+        with self._lock:
+            if full:
+                self._replace(rows)
+            else:
+                for values in rows:
+                    self._upsert_row(values)
+            self.watermark = watermark
+        return len(rows)
+
+    def refresh(self, full=False):
+        start = time.perf_counter()
+        full = full or self.watermark is None
+        if full:
+            self._reload_requested = False
+        # $gte re-reads documents written in the watermark's own millisecond
+        query = {} if full else {'modified_at': {'$gte': self.watermark}}
+        cursor = self.collection.find(query, SNAPSHOT_PROJECTION, batch_size=SNAPSHOT_BATCH_SIZE)
+        loaded = self._load(cursor, full)
+        now = time.monotonic()
+        self.refreshed_at = now
+        if full:
+            self.reloaded_at = now
+        elapsed = time.perf_counter() - start
+        observe_span('snapshot', 'reload' if full else 'refresh', elapsed)
+        logger.debug("Weather snapshot %s: %s documents in %.3fs (%s rows).",
+                     'reloaded' if full else 'refreshed', loaded, elapsed, self.size)
+        return loaded
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        stale = now - self.refreshed_at >= self.refresh_seconds
+        if not stale:
+            return
+        # Only one thread refreshes; the others keep answering from the current
+        # arrays unless nothing has been loaded yet
+        if not self._refresh_lock.acquire(blocking=not self.loaded):
+            return
+        try:
+            if time.monotonic() - self.refreshed_at >= self.refresh_seconds:
+                self.refresh(full=self._reload_requested or now - self.reloaded_at >= self.reload_seconds)
+        finally:
+            self._refresh_lock.release()
+
+    def request_reload(self):
+        # The next ensure_fresh() reloads everything, e.g. after a dropped
+        # collection or a delete whose city is unknown
+        self._reload_requested = True
+        self.refreshed_at = 0.0
+
+    def follow_change_stream(self, refresh_seconds=SNAPSHOT_STREAMING_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+
+    def _valid(self, column):
+        # rows is None when no value is missing, so values stays a view
+        values = self.columns[column][:self.size]
+        missing = np.isnan(values)
+        if not missing.any():
+            return None, values
+        rows = np.flatnonzero(~missing)
+        return rows, values[rows]
+
+    def top_n(self, column, n=5, largest=True):
+        with self._lock:
+            rows, values = self._valid(column)
+            count = len(values)
+            if not count:
+                return []
+            n = min(n, count)
+            if n == count:
+                candidates = np.arange(count)
+            elif largest:
+                candidates = np.argpartition(values, count - n)[count - n:]
+            else:
+                candidates = np.argpartition(values, n - 1)[:n]
+            order = candidates[np.argsort(values[candidates], kind='stable')]
+            if largest:
+                order = order[::-1]
+            if rows is not None:
+                return [(self.names[rows[i]], float(values[i])) for i in order]
+            return [(self.names[i], float(values[i])) for i in order]
+
+    def mean(self, column):
+        with self._lock:
+            _, values = self._valid(column)
+            return float(values.mean()) if len(values) else None
+
+    def percentiles(self, column, percentiles=(10, 25, 50, 75, 90)):
+        with self._lock:
+            _, values = self._valid(column)
+            if not len(values):
+                return None
+            return dict(zip(percentiles, np.percentile(values, percentiles).tolist()))
+
+    def group_mean(self, column):
+        # Mean per country as (country, mean, count), highest mean first
+        # Copied under the lock: an upsert may grow the arrays or add a country
+        with self._lock:
+            rows, values = self._valid(column)
+            if rows is None:
+                values = values.copy()
+                codes = self.country_codes[:self.size].copy()
+            else:
+                codes = self.country_codes[rows]
+            groups = list(self.country_names)
+        if not len(values):
+            return []
+        counts = np.bincount(codes, minlength=len(groups))
+        sums = np.bincount(codes, weights=values, minlength=len(groups))
+        present = np.flatnonzero(counts)
+        means = sums[present] / counts[present]
+        order = np.argsort(-means, kind='stable')
+        return [(groups[present[i]], float(means[i]), int(counts[present[i]])) for i in order]
+
+    def get(self, city_id, column):
+        with self._lock:
+            row = self._rows.get(city_id)
+            if row is None:
+                return None
+            value = self.columns[column][row]
+            return None if np.isnan(value) else float(value)
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_weather_snapshot():
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = WeatherSnapshot()
+    return _snapshot
+
+def loaded_snapshot():
+    # For write-through: never triggers the initial load
+    snapshot = _snapshot
+    return snapshot if snapshot is not None and snapshot.loaded else None
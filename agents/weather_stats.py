@@ -0,0 +1,79 @@
+# agents/weather_stats.py
+
+from utils.db_utils import backfill_name_keys, get_db, normalize_city_name
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Per-city temperature/humidity rollups, keyed by the OpenWeatherMap city id
+CITY_STATS_COLLECTION = 'city_stats'
+
+def _accumulate(is_new, field, expr):
+    return {'$cond': [is_new, expr, f'${field}']}
+
+def city_stats_update(weather_data):
+    temp = weather_data['main']['temp']
+    humidity = weather_data['main']['humidity']
+    dt = weather_data['dt']
+    # Re-storing an observation we already counted (same dt) must not skew the rollup
+    is_new = {'$lt': [{'$ifNull': ['$last_dt', -1]}, dt]}
+    pipeline = [
+        {'$set': {
+            'name': {'$literal': weather_data['name']},
+            'name_key': {'$literal': normalize_city_name(weather_data['name'])},
+            'count': _accumulate(is_new, 'count', {'$add': [{'$ifNull': ['$count', 0]}, 1]}),
+            'temp_sum': _accumulate(is_new, 'temp_sum', {'$add': [{'$ifNull': ['$temp_sum', 0]}, temp]}),
+            'temp_min': _accumulate(is_new, 'temp_min', {'$min': ['$temp_min', temp]}),
+            'temp_max': _accumulate(is_new, 'temp_max', {'$max': ['$temp_max', temp]}),
+            'temp_last': _accumulate(is_new, 'temp_last', temp),
+            'humidity_sum': _accumulate(is_new, 'humidity_sum', {'$add': [{'$ifNull': ['$humidity_sum', 0]}, humidity]}),
+            'humidity_min': _accumulate(is_new, 'humidity_min', {'$min': ['$humidity_min', humidity]}),
+            'humidity_max': _accumulate(is_new, 'humidity_max', {'$max': ['$humidity_max', humidity]}),
+            'humidity_last': _accumulate(is_new, 'humidity_last', humidity),
+            'last_dt': _accumulate(is_new, 'last_dt', dt),
+        }},
+        # Averages are materialized so top-N queries can sort on an index
+        {'$set': {
+            'temp_avg': {'$divide': ['$temp_sum', '$count']},
+            'humidity_avg': {'$divide': ['$humidity_sum', '$count']},
+        }},
+    ]
+    return {'_id': weather_data['id']}, pipeline
+
+def delete_city_stats(city_id):
+    return get_db()[CITY_STATS_COLLECTION].delete_one({'_id': city_id}).deleted_count
+
+def rebuild_city_stats():
+    # name_key is copied from weather_data, so it must use normalize_city_name
+    backfill_name_keys('weather_data')
+    pipeline = [
+        {'$match': {'id': {'$ne': None}, 'main.temp': {'$type': 'number'}}},
+        {'$sort': {'dt': 1}},
+        {'$group': {
+            '_id': '$id',
+            'name': {'$last': '$name'},
+            'name_key': {'$last': '$name_key'},
+            'count': {'$sum': 1},
+            'temp_sum': {'$sum': '$main.temp'},
+            'temp_min': {'$min': '$main.temp'},
+            'temp_max': {'$max': '$main.temp'},
+            'temp_last': {'$last': '$main.temp'},
+            'humidity_sum': {'$sum': '$main.humidity'},
+            'humidity_min': {'$min': '$main.humidity'},
+            'humidity_max': {'$max': '$main.humidity'},
+            'humidity_last': {'$last': '$main.humidity'},
+            'last_dt': {'$max': '$dt'},
+        }},
+        {'$set': {
+            'temp_avg': {'$divide': ['$temp_sum', '$count']},
+            'humidity_avg': {'$divide': ['$humidity_sum', '$count']},
+        }},
+        {'$merge': {'into': CITY_STATS_COLLECTION, 'whenMatched': 'replace'}},
+    ]
+    get_db()['weather_data'].aggregate(pipeline, allowDiskUse=True)
+    return get_db()[CITY_STATS_COLLECTION].estimated_document_count()
+
+def ensure_city_stats():
+    if get_db()[CITY_STATS_COLLECTION].estimated_document_count() == 0:
+        rebuilt = rebuild_city_stats()
+        logger.debug("Rebuilt city_stats rollups for %s cities.", rebuilt)
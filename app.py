@@ -1,8 +1,54 @@
 # app.py
 
-from swarm.repl import run_demo_loop
+from swarm.repl.repl import pretty_print_messages, process_and_print_streaming_response
+from agents.direct_response import DirectResponseSwarm
+from agents.fast_router import route_message
 from agents.router_agent import router_agent
+from agents.weather_history import ensure_weather_history
+from agents.weather_stats import ensure_city_stats
+from utils.db_utils import ensure_indexes
+from utils.fake_llm import get_llm_client
+from utils.instrumentation import configure_logging
 
-if __name__ == "__main__":
-    run_demo_loop(router_agent)
+def run_loop(starting_agent, context_variables=None, stream=False, debug=False):
+    client = DirectResponseSwarm(client=get_llm_client())
+    print("Starting Swarm CLI 🐝")
+
+    messages = []
+    agent = starting_agent
+    while True:
+        try:
+            user_input = input("\033[90mUser\033[0m: ")
+        except (EOFError, KeyboardInterrupt):
+            break
+        messages.append({"role": "user", "content": user_input})
+
+        # Confidently classified turns skip the router's LLM hop; the rest
+        # stay with the current agent, which starts as the LLM router
+        routed_agent = route_message(user_input)
+        if routed_agent is not None:
+            agent = routed_agent
 
+        response = client.run(
+            agent=agent,
+            messages=messages,
+            context_variables=context_variables or {},
+            stream=stream,
+            debug=debug,
+        )
+        if stream:
+            response = process_and_print_streaming_response(response)
+        else:
+            pretty_print_messages(response.messages)
+        messages.extend(response.messages)
+        agent = response.agent
+
+    for path, stats in client.turn_metrics().items():
+        print(f"{path} turns: {stats['count']}, p50 {stats['p50_ms']:.0f} ms, p99 {stats['p99_ms']:.0f} ms")
+
+if __name__ == "__main__":
+    configure_logging()
+    ensure_indexes()
+    ensure_city_stats()
+    ensure_weather_history()
+    run_loop(router_agent)
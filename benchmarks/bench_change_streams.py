@@ -0,0 +1,106 @@
+# benchmarks/bench_change_streams.py
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_weather_server import make_weather_payload
+
+# Measures how long a write made by another client takes to reach this
+# process's weather cache and snapshot through the change stream. Needs a
+# replica set, e.g. the mongodb-rs service in docker-compose.yml.
+
+def wait_for(predicate, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.0005)
+    return False
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Change stream invalidation latency against a replica set.")
+    parser.add_argument('--writes', type=int, default=200, help="Updates made by the other writer")
+    parser.add_argument('--cities', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=5.0, help="Seconds to wait for each event")
+    parser.add_argument('--output', default='bench_change_streams.json')
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+    from utils.db_utils import DATABASE_NAME, client_options, get_db
+    import agents.weather_agent as weather_agent
+
+    # The writer is a separate client, standing in for another worker
+    writer = MongoClient(os.environ['MONGODB_URI'], **client_options())[DATABASE_NAME]['weather_data']
+    payloads = [make_weather_payload(city_id=900000 + i) for i in range(args.cities)]
+    for payload in payloads:
+        writer.update_one(*weather_agent.weather_upsert(dict(payload), datetime.utcnow()), upsert=True)
+
+    snapshot = weather_agent.analytics_snapshot()
+    watcher = weather_agent.start_weather_watcher()
+    time.sleep(1.0)
+
+    update_latencies = []
+    missed = 0
+    for i in range(args.writes):
+        payload = dict(payloads[i % len(payloads)], main=dict(payloads[0]['main'], temp=100.0 + i))
+        name_key = payload['name'].lower()
+        start = time.perf_counter()
+        writer.update_one(*weather_agent.weather_upsert(payload, datetime.utcnow()))
+
+        def applied():
+            cached = weather_agent.weather_cache.get(name_key)
+            return cached is not None and cached.temp == 100.0 + i
+
+        if wait_for(applied, args.timeout):
+            update_latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            missed += 1
+
+    delete_latencies = []
+    for payload in payloads:
+        name_key = payload['name'].lower()
+        start = time.perf_counter()
+        writer.delete_one({'id': payload['id']})
+
+        def removed():
+            if weather_agent.weather_cache.get(name_key) is not None:
+                return False
+            return snapshot is None or snapshot.get(payload['id'], 'temp') is None
+
+        if wait_for(removed, args.timeout):
+            delete_latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            missed += 1
+    watcher.stop()
+    get_db()['weather_data'].delete_many({'id': {'$in': [payload['id'] for payload in payloads]}})
+
+    results = {'timestamp': time.time(), 'events': watcher.events, 'missed': missed}
+    for name, samples in (('update', update_latencies), ('delete', delete_latencies)):
+        if not samples:
+            continue
+        results[name] = {
+            'count': len(samples),
+            'p50_ms': statistics.median(samples),
+            'p99_ms': percentile(samples, 0.99),
+            'max_ms': max(samples),
+        }
+        print(f"{name:6s} n={len(samples):4d} p50={results[name]['p50_ms']:.2f}ms "
+              f"p99={results[name]['p99_ms']:.2f}ms max={results[name]['max_ms']:.2f}ms")
+    print(f"events={watcher.events} missed={missed}")
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# benchmarks/bench_e2e.py
+
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_weather_server import start_stub_server
+
+MESSAGES = [
+    "weather in london",
+    "what's the weather in paris",
+    "weather in tokyo",
+    "hottest cities",
+    "coldest cities",
+    "average temperature",
+    "average humidity",
+    "list all cities in the database",
+    "visibility in berlin",
+    "show users",
+    "can you help me with something?",
+]
+SEED_CITIES = ['London', 'Paris', 'Tokyo', 'Berlin', 'Madrid', 'Cairo']
+
+class StageTimer:
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def wrap(self, owner, name, stage):
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        setattr(owner, name, timed)
+
+    def reset(self):
+        with self._lock:
+            self.totals.clear()
+            self.counts.clear()
+
+    def summary(self, turns):
+        with self._lock:
+            return {
+                stage: {
+                    'calls': self.counts[stage],
+                    'total_ms': total * 1000,
+                    'per_turn_ms': total * 1000 / turns if turns else 0.0,
+                }
+                for stage, total in sorted(self.totals.items())
+            }
+
+def use_mongomock():
+    import mongomock
+    from utils.db_utils import DATABASE_NAME, set_db
+    mock_db = mongomock.MongoClient()[DATABASE_NAME]
+    set_db(mock_db)
+    return mock_db
+
+def instrument(timer, collection_class):
+    import agents.weather_agent as weather_agent
+    import server
+    from utils.fake_llm import FakeCompletions
+    from utils.weather_client import WeatherAPIClient
+
+    timer.wrap(server, 'route_message', 'routing')
+    timer.wrap(weather_agent, 'match_intent', 'regex_dispatch')
+    timer.wrap(weather_agent, 'extract_city_name', 'regex_dispatch')
+    timer.wrap(weather_agent, 'format_weather_response', 'formatting')
+    timer.wrap(WeatherAPIClient, 'get', 'http')
+    timer.wrap(FakeCompletions, 'create', 'llm')
+    for method in ('find', 'find_one', 'aggregate', 'distinct', 'update_one', 'bulk_write',
+                   'insert_one', 'insert_many', 'delete_one', 'delete_many'):
+        timer.wrap(collection_class, method, 'db')
+
+def run_level(conversations_server, concurrency, turns, seed):
+    rng = random.Random(seed)
+    scripts = [[rng.choice(MESSAGES) for _ in range(turns)] for _ in range(concurrency)]
+
+    def conversation(script):
+        session = conversations_server.get_session(conversations_server.create_session())
+        for message in script:
+            conversations_server.submit(session, message).result()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(conversation, scripts))
+    return time.perf_counter() - start
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end agent pipeline benchmark with a fake LLM.")
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated concurrency levels")
+    parser.add_argument('--turns', type=int, default=20, help="Turns per conversation")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Fake completion latency in seconds")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="Stub weather API latency in seconds")
+    parser.add_argument('--mongomock', action='store_true', help="Use mongomock instead of MONGODB_URI")
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    weather_api = start_stub_server(delay=args.api_latency)
+    os.environ['OPEN_WEATHER_BASE_URL'] = weather_api.base_url
+    os.environ.setdefault('OPEN_WEATHER_API', 'stub-key')
+
+    from load_mongo_data import load_data
+    from server import ConversationServer
+    from agents.router_agent import router_agent
+    from utils.fake_llm import FakeLLMClient
+    import agents.weather_agent as weather_agent
+
+    if args.mongomock:
+        import mongomock
+        db = use_mongomock()
+        collection_class = mongomock.collection.Collection
+    else:
+        import pymongo.collection
+        from agents.weather_history import ensure_weather_history
+        from utils.db_utils import ensure_indexes, get_db
+        db = get_db()
+        ensure_indexes()
+        ensure_weather_history()
+        collection_class = pymongo.collection.Collection
+
+    load_data(db, workers=1)
+    for city in SEED_CITIES:
+        weather_agent.update_weather_for_city(city)
+
+    timer = StageTimer()
+    instrument(timer, collection_class)
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'backend': 'mongomock' if args.mongomock else 'mongod',
+        'llm_latency_s': args.llm_latency,
+        'api_latency_s': args.api_latency,
+        'levels': [],
+    }
+    for level, concurrency in enumerate(int(c) for c in args.concurrency.split(',')):
+        conversations_server = ConversationServer(router_agent, llm_client=FakeLLMClient(latency=args.llm_latency),
+                                                  workers=concurrency, max_pending=concurrency * 4)
+        weather_agent.weather_cache.clear()
+        timer.reset()
+        tracemalloc.start()
+        elapsed = run_level(conversations_server, concurrency, args.turns, args.seed + level)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        conversations_server.shutdown()
+
+        stats = conversations_server.stats()
+        turns = stats['turns']
+        results['levels'].append({
+            'concurrency': concurrency,
+            'turns': turns,
+            'elapsed_s': elapsed,
+            'throughput_per_s': turns / elapsed if elapsed else 0.0,
+            'p50_ms': stats['p50_ms'],
+            'p99_ms': stats['p99_ms'],
+            'direct_turns': stats['direct_turns'],
+            'stages': timer.summary(turns),
+            'peak_traced_memory_bytes': peak_memory,
+        })
+        print(f"concurrency={concurrency:3d} turns={turns:5d} "
+              f"throughput={turns / elapsed:8.1f}/s p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+
+    results['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    weather_api.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_gazetteer.py
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agents.city_gazetteer import CITY_ALIASES, CityGazetteer
+
+# Times building the city gazetteer, resolving what users type (exact names,
+# aliases, names it does not know) and correcting prefixes and typos the API
+# did not find. Synthetic cities stand in for a large weather_data collection.
+
+SYLLABLES = [consonant + vowel for consonant in 'bcdfghklmnprstvz' for vowel in 'aeiou'] + ['ton', 'burg', 'ville']
+COUNTRIES = ['GB', 'FR', 'DE', 'ES', 'IT', 'US', 'CA', 'BR', 'IN', 'JP']
+KNOWN_CITIES = [
+    (5128581, 'New York', 'US'), (2643743, 'London', 'GB'), (6058560, 'London', 'CA'),
+    (3448439, 'São Paulo', 'BR'), (2988507, 'Paris', 'FR'), (5391959, 'San Francisco', 'US'),
+    (5368361, 'Los Angeles', 'US'), (4407066, 'St. Louis', 'US'), (1850147, 'Tokyo', 'JP'),
+    (2950159, 'Berlin', 'DE'), (3169070, 'Rome', 'IT'), (1275339, 'Mumbai', 'IN'),
+]
+
+def city_documents(count, seed):
+    rng = random.Random(seed)
+    for city_id, name, country in KNOWN_CITIES:
+        yield {'id': city_id, 'name': name, 'sys': {'country': country}}
+    for i in range(count):
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        yield {'id': 10_000_000 + i, 'name': name, 'sys': {'country': rng.choice(COUNTRIES)}}
+
+def typo(name, rng):
+    # One dropped, doubled or swapped letter past the first
+    i = rng.randrange(1, len(name) - 1)
+    return rng.choice([
+        name[:i] + name[i + 1:],
+        name[:i] + name[i] + name[i:],
+        name[:i] + name[i + 1] + name[i] + name[i + 2:],
+    ])
+
+def workloads(documents, samples, seed):
+    rng = random.Random(seed)
+    names = [doc['name'] for doc in documents if len(doc['name']) >= 6]
+    aliases = [alias for alias, target in CITY_ALIASES.items()
+               if target in {'new york', 'los angeles', 'san francisco', 'rome', 'mumbai'}]
+    return {
+        'exact': [rng.choice(names) for _ in range(samples)],
+        'alias': [rng.choice(aliases) for _ in range(samples)],
+        'prefix': [rng.choice(names)[:-1] for _ in range(samples)],
+        'typo': [typo(rng.choice(names).lower(), rng) for _ in range(samples)],
+        'unknown': [f'Qx{rng.randrange(10 ** 6)}ville' for _ in range(samples)],
+    }
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def build(documents, args):
+    gazetteer = CityGazetteer()
+    if args.mongomock:
+        import mongomock
+        collection = mongomock.MongoClient()['bench']['gazetteer_bench']
+        collection.insert_many([dict(doc) for doc in documents])
+        start = time.perf_counter()
+        gazetteer.load(collection)
+        return gazetteer, time.perf_counter() - start
+    tracemalloc.start()
+    start = time.perf_counter()
+    for document in documents:
+        gazetteer.add_document(document)
+    elapsed = time.perf_counter() - start
+    gazetteer.held_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return gazetteer, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="City gazetteer build time and resolve latency.")
+    parser.add_argument('--cities', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=2000, help="Lookups per workload")
+    parser.add_argument('--mongomock', action='store_true', help="Time load() from a mongomock collection")
+    parser.add_argument('--output', default='bench_gazetteer.json')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    documents = list(city_documents(args.cities, args.seed))
+    gazetteer, build_s = build(documents, args)
+    results = {
+        'timestamp': time.time(),
+        'cities': len(gazetteer),
+        'build_s': build_s,
+        'held_bytes': getattr(gazetteer, 'held_bytes', None),
+        'workloads': {},
+    }
+    print(f"cities={len(gazetteer)} build={build_s:.2f}s")
+
+    for name, queries in workloads(documents, args.samples, args.seed).items():
+        lookup = gazetteer.correct if name in ('prefix', 'typo') else gazetteer.resolve
+        latencies, resolved = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            resolution = lookup(query)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            resolved += resolution.entry is not None
+        results['workloads'][name] = {
+            'p50_us': statistics.median(latencies),
+            'p99_us': percentile(latencies, 0.99),
+            'max_us': max(latencies),
+            'resolved': resolved / len(queries),
+        }
+        stats = results['workloads'][name]
+        print(f"{name:8s} p50={stats['p50_us']:8.1f}us p99={stats['p99_us']:8.1f}us "
+              f"max={stats['max_us']:8.1f}us resolved={stats['resolved']:.0%}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
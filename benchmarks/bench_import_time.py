@@ -0,0 +1,64 @@
+# benchmarks/bench_import_time.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = [
+    'agents',
+    'agents.fast_router',
+    'utils.db_utils',
+    'agents.router_agent',
+    'agents.weather_agent',
+    'server',
+]
+
+def import_time(module, env):
+    # -X importtime reports "self | cumulative | name" in microseconds on stderr
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        imported[name] = int(cumulative)
+    return imported[module], len(imported)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the agent modules.")
+    parser.add_argument('modules', nargs='*', default=TARGETS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    # Importing must not require a database URI or a connection
+    env = dict(os.environ)
+    env.pop('MONGODB_URI', None)
+
+    results = {}
+    for module in args.modules:
+        try:
+            samples = [import_time(module, env) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(e)
+            continue
+        cumulative_ms = statistics.median(sample[0] for sample in samples) / 1000
+        results[module] = {'cumulative_ms': cumulative_ms, 'modules_imported': samples[0][1]}
+        print(f"{module:24s} {cumulative_ms:8.1f} ms  ({samples[0][1]} modules)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_intent_dispatch.py
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.weather_intents import extract_city_name, match_intent
+
+CITIES = [
+    'london', 'paris', 'new york', 'tokyo', 'sao paulo', 'los angeles', 'berlin', 'madrid',
+    'rome', 'cairo', 'mumbai', 'sydney', 'toronto', 'mexico city', 'buenos aires', 'lagos',
+]
+
+TEMPLATES = [
+    "list all the cities in the database",
+    "show cities from the database",
+    "average temperature",
+    "mean temp",
+    "delete the city {city}",
+    "remove {city}",
+    "update the city of {city}",
+    "refresh weather data for {city}",
+    "hottest cities",
+    "coolest city",
+    "average humidity",
+    "visibility in {city}",
+    "visibility",
+    "weather in {city}",
+    "what's the weather in {city}",
+    "get forecast for {city}",
+    "forecast in {city}",
+    "hottest",
+    "humidity",
+    "{city}",
+    "show the current weather for {city}",
+    "get weather data for {city} from the database",
+    "tell me a joke!",
+]
+
+# The per-call pattern table and if/elif walk that process_weather_request used before
+def legacy_route(message):
+    user_request = message.lower().strip()
+    patterns = {
+        'list_cities': r"^(list|show)\s+(all\s+)?(the\s+)?(cities|city)\s+(in|from)?\s+(the\s+)?database$",
+        'average_temperature': r"^(average|mean)\s+(temperature|temp)$",
+        'delete_city': r"^(delete|remove)\s+(?:the\s+)?(?:city\s+)?([\w\s,]+)$",
+        'update_city': r"^(update|refresh)\s+(?:the\s+city\s+of\s+)?(?:weather\s+data\s+for\s+)?([\w\s,]+)$",
+        'hottest_cities': r"^(hottest|warmest)\s+(cities|city)$",
+        'coldest_cities': r"^(coldest|coolest)\s+(cities|city)$",
+        'average_humidity': r"^(average|mean)\s+humidity$",
+        'visibility': r"^(visibility)\s*(?:in\s+([\w\s,]+))?$",
+        'weather_in_city': r"^(weather in|current weather in|what's the weather in|get weather for|show forecast for|get forecast for)\s+([\w\s,]+)$",
+        'forecast_in_city': r"^(forecast in|show forecast in|get forecast for)\s+([\w\s,]+)$",
+        'hottest': r"^(hottest)$",
+        'humidity': r"^(humidity)$",
+    }
+    for intent, pattern in patterns.items():
+        match = re.match(pattern, user_request)
+        if match:
+            if intent in ('delete_city', 'update_city', 'visibility', 'weather_in_city', 'forecast_in_city'):
+                city_name = match.group(2)
+                return intent, city_name.strip() if city_name else None
+            return intent, None
+    return 'city_weather', legacy_extract_city_name(user_request)
+
+def legacy_extract_city_name(user_request):
+    user_request = user_request.lower().strip()
+    user_request = re.sub(r"\s+from\s+(?:the\s+)?(?:database|weather database)$", "", user_request)
+    user_request = re.sub(r"^(update|refresh)\s+(?:the\s+city\s+of\s+)?(?:weather\s+data\s+for\s+)?", "", user_request)
+    user_request = re.sub(r"^(get|show|provide)\s+(?:the\s+)?(?:current\s+)?weather\s+for\s+", "", user_request)
+    user_request = re.sub(r"^(get|show|provide)\s+(?:the\s+)?forecast\s+for\s+", "", user_request)
+    match = re.search(r"^([\w\s,]+)$", user_request)
+    return match.group(1).strip() if match else None
+
+def compiled_route(message):
+    user_request = message.lower().strip()
+    intent, city_name = match_intent(user_request)
+    if intent is None:
+        return 'city_weather', extract_city_name(user_request)
+    return intent, city_name
+
+def build_corpus(size, seed):
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(city=rng.choice(CITIES)) for _ in range(size)]
+
+def time_router(route, corpus, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in corpus:
+            route(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus)
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-message routing cost of the weather intent dispatcher.")
+    parser.add_argument('--size', type=int, default=5000, help="Number of sample utterances")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed passes; the best one is reported")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.size, args.seed)
+    mismatches = [m for m in corpus if legacy_route(m) != compiled_route(m)]
+    legacy = time_router(legacy_route, corpus, args.repeat)
+    compiled = time_router(compiled_route, corpus, args.repeat)
+
+    print(f"Corpus: {len(corpus)} utterances, {len(mismatches)} routing mismatches")
+    for message in mismatches[:10]:
+        print(f"  mismatch: {message!r}: {legacy_route(message)} != {compiled_route(message)}")
+    print(f"Legacy pattern loop:  {legacy * 1e6:8.2f} us/message")
+    print(f"Compiled dispatcher:  {compiled * 1e6:8.2f} us/message")
+    print(f"Speedup:              {legacy / compiled:8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/bench_projection.py
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bson
+from bson import ObjectId
+from benchmarks.stub_weather_server import make_weather_payload
+
+# Compares whole-document weather reads with the projected reads and
+# WeatherRecord tuples: wire bytes and decode time per document, memory held
+# by a full cache, and optionally find_one latency against a database.
+
+def stored_document(city_id):
+    doc = make_weather_payload(city_id=city_id)
+    now = datetime.utcnow()
+    doc.update(_id=ObjectId(), name_key=doc['name'].lower(), created_at=now, modified_at=now)
+    return doc
+
+def project(doc, projection):
+    # What the server would send back for an inclusion projection
+    projected = {}
+    for path, include in projection.items():
+        if not include:
+            continue
+        head, _, rest = path.partition('.')
+        if head not in doc:
+            continue
+        if not rest:
+            projected[head] = doc[head]
+        elif isinstance(doc[head], list):
+            projected[head] = [{rest: item[rest]} for item in doc[head] if rest in item]
+        else:
+            projected.setdefault(head, {})[rest] = doc[head][rest]
+    return projected
+
+def median_us(func, items, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        samples.append((time.perf_counter() - start) / len(items) * 1e6)
+    return statistics.median(samples)
+
+def held_bytes(build, items):
+    tracemalloc.start()
+    kept = [build(item) for item in items]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size / len(items)
+
+def decode_costs(weather_agent, documents, repeat):
+    full = [bson.encode(doc) for doc in documents]
+    projected = [bson.encode(project(doc, weather_agent.WEATHER_RECORD_PROJECTION)) for doc in documents]
+    visibility = [bson.encode(project(doc, {'visibility': 1})) for doc in documents]
+    results = {}
+    for name, encoded, build in (
+        ('full_document', full, bson.decode),
+        ('projected_record', projected, lambda data: weather_agent.weather_record(bson.decode(data))),
+        ('visibility_only', visibility, bson.decode),
+    ):
+        results[name] = {
+            'bytes_per_doc': sum(len(data) for data in encoded) / len(encoded),
+            'decode_us': median_us(build, encoded, repeat),
+            'held_bytes_per_entry': held_bytes(build, encoded),
+        }
+    # Formatting a cached entry, as the hot path does on every hit
+    records = [weather_agent.weather_record(doc) for doc in documents]
+    results['format_record_us'] = median_us(weather_agent.format_weather_response, records, repeat)
+    return results
+
+def lookup_latency(weather_agent, collection, documents, repeat):
+    from utils.db_utils import INDEXES
+    collection.drop()
+    collection.insert_many(documents)
+    collection.create_indexes(INDEXES['weather_data'])
+    keys = [doc['name_key'] for doc in documents]
+    queries = {
+        'find_one_full': lambda key: collection.find_one({'name_key': key}),
+        'find_one_projected': lambda key: collection.find_one({'name_key': key},
+                                                              weather_agent.WEATHER_RECORD_PROJECTION),
+        'visibility_covered': lambda key: collection.find_one({'name_key': key}, {'_id': 0, 'visibility': 1}),
+    }
+    results = {name: {'latency_us': median_us(query, keys, repeat)} for name, query in queries.items()}
+    try:
+        plan = collection.find({'name_key': keys[0]}, {'_id': 0, 'visibility': 1}).explain()
+        stats = plan.get('executionStats', {})
+        results['visibility_covered']['docs_examined'] = stats.get('totalDocsExamined')
+    except Exception:
+        pass
+    collection.drop()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Projected weather reads vs whole documents.")
+    parser.add_argument('--documents', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5, help="Passes per measurement; the median is reported")
+    parser.add_argument('--lookups', action='store_true', help="Also time find_one against the database")
+    parser.add_argument('--mongomock', action='store_true', help="Use mongomock instead of MONGODB_URI")
+    parser.add_argument('--output', default='bench_projection.json')
+    args = parser.parse_args()
+
+    import agents.weather_agent as weather_agent
+    documents = [stored_document(city_id) for city_id in range(1, args.documents + 1)]
+    results = {'timestamp': time.time(), 'documents': args.documents,
+               'decode': decode_costs(weather_agent, documents, args.repeat)}
+    for name in ('full_document', 'projected_record', 'visibility_only'):
+        cost = results['decode'][name]
+        print(f"{name:18s} {cost['bytes_per_doc']:7.0f} B/doc  decode={cost['decode_us']:6.2f}us  "
+              f"held={cost['held_bytes_per_entry']:6.0f} B/entry")
+    print(f"{'format_record':18s} {results['decode']['format_record_us']:.2f}us")
+
+    if args.lookups:
+        if args.mongomock:
+            import mongomock
+            collection = mongomock.MongoClient()['bench']['weather_projection_bench']
+        else:
+            from utils.db_utils import get_db
+            collection = get_db()['weather_projection_bench']
+        results['lookups'] = lookup_latency(weather_agent, collection, documents, args.repeat)
+        for name, stats in results['lookups'].items():
+            print(f"{name:18s} {stats['latency_us']:8.1f}us  docs_examined={stats.get('docs_examined', '-')}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_singleflight.py
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_weather_server import start_stub_server
+
+def main():
+    parser = argparse.ArgumentParser(description="Stampede concurrent refreshes of one city against a stub API.")
+    parser.add_argument('--callers', type=int, default=50)
+    parser.add_argument('--city', default='London')
+    parser.add_argument('--delay', type=float, default=0.2, help="Simulated upstream latency in seconds")
+    args = parser.parse_args()
+
+    server = start_stub_server(delay=args.delay)
+    os.environ['OPEN_WEATHER_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPEN_WEATHER_API', 'stub-key')
+
+    import agents.weather_agent as weather_agent
+
+    barrier = threading.Barrier(args.callers)
+    errors = []
+
+    def caller():
+        barrier.wait()
+        error = weather_agent.update_weather_for_city(args.city)
+        if error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=caller) for _ in range(args.callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"Callers: {args.callers}")
+    print(f"Upstream requests: {server.request_count}")
+    print(f"Errors: {len(errors)}")
+    print(f"Wall time: {elapsed * 1000:.1f} ms")
+    print(f"Single-flight stats: {weather_agent.weather_updates.stats()}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
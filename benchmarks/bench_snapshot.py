@@ -0,0 +1,168 @@
+# benchmarks/bench_snapshot.py
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_weather_server import make_weather_payload
+
+COLLECTION = 'weather_snapshot_bench'
+COUNTRIES = ['GB', 'FR', 'DE', 'ES', 'IT', 'US', 'CA', 'BR', 'IN', 'JP', 'CN', 'AU', 'EG', 'ZA', 'MX']
+PERCENTILES = (10, 25, 50, 75, 90)
+
+def weather_documents(count, seed):
+    rng = random.Random(seed)
+    for city_id in range(1, count + 1):
+        doc = make_weather_payload(city_id=city_id)
+        doc['main']['temp'] = round(rng.uniform(-30, 45), 2)
+        doc['main']['humidity'] = rng.randint(5, 100)
+        doc['sys']['country'] = rng.choice(COUNTRIES)
+        doc['name_key'] = doc['name'].lower()
+        # Spread over an hour, as a rolling refresh would leave them
+        doc['modified_at'] = datetime(2024, 1, 1) + timedelta(seconds=city_id % 3600)
+        yield doc
+
+def populate(collection, count, seed, batch_size=10000):
+    from pymongo import ASCENDING
+    collection.drop()
+    batch = []
+    for doc in weather_documents(count, seed):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    # Same indexes the agents rely on for weather_data
+    collection.create_index([('main.temp', ASCENDING)])
+    collection.create_index([('modified_at', ASCENDING)])
+
+def touch(collection, count, fraction, seed):
+    # Simulates a refresh cycle rewriting a fraction of the cities
+    rng = random.Random(seed)
+    modified_at = datetime(2024, 1, 1) + timedelta(hours=2)
+    city_ids = rng.sample(range(1, count + 1), max(1, int(count * fraction)))
+    collection.update_many({'id': {'$in': city_ids}},
+                           {'$set': {'modified_at': modified_at}, '$inc': {'main.temp': 0.5}})
+    return len(city_ids)
+
+def mongo_queries(collection):
+    def hottest():
+        return list(collection.find({}, {'name': 1, 'main.temp': 1}).sort('main.temp', -1).limit(5))
+
+    def average():
+        return list(collection.aggregate([{'$group': {'_id': None, 'avg': {'$avg': '$main.temp'}}}]))
+
+    def percentiles():
+        temps = sorted(doc['main']['temp'] for doc in collection.find({}, {'_id': 0, 'main.temp': 1}))
+        return [temps[int((len(temps) - 1) * p / 100)] for p in PERCENTILES]
+
+    def by_country():
+        return list(collection.aggregate([
+            {'$group': {'_id': '$sys.country', 'avg': {'$avg': '$main.temp'}, 'cities': {'$sum': 1}}},
+            {'$sort': {'avg': -1}},
+        ], allowDiskUse=True))
+
+    return {'top_n': hottest, 'mean': average, 'percentiles': percentiles, 'group_by': by_country}
+
+def snapshot_queries(snapshot):
+    return {
+        'top_n': lambda: snapshot.top_n('temp', 5),
+        'mean': lambda: snapshot.mean('temp'),
+        'percentiles': lambda: snapshot.percentiles('temp', PERCENTILES),
+        'group_by': lambda: snapshot.group_mean('temp'),
+    }
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def snapshot_bytes(snapshot):
+    arrays = [snapshot.ids, snapshot.dt, snapshot.names, snapshot.name_keys, snapshot.country_codes,
+              *snapshot.columns.values()]
+    return sum(array.nbytes for array in arrays)
+
+def run_size(collection, count, args):
+    from agents.weather_snapshot import WeatherSnapshot
+
+    start = time.perf_counter()
+    populate(collection, count, args.seed)
+    populate_s = time.perf_counter() - start
+
+    snapshot = WeatherSnapshot(collection=collection)
+    start = time.perf_counter()
+    snapshot.refresh(full=True)
+    load_s = time.perf_counter() - start
+
+    touched = touch(collection, count, args.touch, args.seed)
+    start = time.perf_counter()
+    refreshed = snapshot.refresh()
+    refresh_s = time.perf_counter() - start
+
+    mongo = mongo_queries(collection)
+    vectorized = snapshot_queries(snapshot)
+    queries = {}
+    for name in mongo:
+        mongo_ms = median_ms(mongo[name], args.repeat)
+        snapshot_ms = median_ms(vectorized[name], args.repeat)
+        queries[name] = {
+            'mongo_ms': mongo_ms,
+            'snapshot_ms': snapshot_ms,
+            'speedup': mongo_ms / snapshot_ms if snapshot_ms else None,
+        }
+        print(f"rows={count:8d} {name:12s} mongo={mongo_ms:10.3f}ms snapshot={snapshot_ms:8.3f}ms "
+              f"speedup={mongo_ms / snapshot_ms:8.1f}x")
+    print(f"rows={count:8d} populate={populate_s:.2f}s full_load={load_s * 1000:.1f}ms "
+          f"refresh({touched} touched, {refreshed} read)={refresh_s * 1000:.1f}ms")
+    return {
+        'rows': count,
+        'populate_s': populate_s,
+        'full_load_ms': load_s * 1000,
+        'incremental_refresh_ms': refresh_s * 1000,
+        'touched': touched,
+        'refreshed': refreshed,
+        'snapshot_bytes': snapshot_bytes(snapshot),
+        'queries': queries,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar weather snapshot vs MongoDB query benchmark.")
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="Comma-separated row counts")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per query; the median is reported")
+    parser.add_argument('--touch', type=float, default=0.01, help="Fraction of rows rewritten before refresh")
+    parser.add_argument('--mongomock', action='store_true', help="Use mongomock instead of MONGODB_URI")
+    parser.add_argument('--output', default='bench_snapshot.json')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        collection = mongomock.MongoClient()['bench'][COLLECTION]
+    else:
+        from utils.db_utils import get_db
+        collection = get_db()[COLLECTION]
+
+    results = {
+        'timestamp': time.time(),
+        'backend': 'mongomock' if args.mongomock else 'mongod',
+        'repeat': args.repeat,
+        'sizes': [run_size(collection, int(size), args) for size in args.sizes.split(',')],
+    }
+    collection.drop()
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/load_test_async.py
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_weather_server import start_stub_server
+
+CITIES = ['London', 'Paris', 'Tokyo', 'Berlin', 'Madrid', 'Rome', 'Cairo', 'Lima', 'Oslo', 'Seoul']
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+async def conversation(weather_async, turns, rng, latencies):
+    actions = [
+        lambda: weather_async.get_or_fetch_weather_async(rng.choice(CITIES)),
+        weather_async.get_hottest_cities_async,
+        weather_async.get_average_temperature_async,
+        weather_async.get_average_humidity_async,
+    ]
+    for _ in range(turns):
+        start = time.perf_counter()
+        await rng.choice(actions)()
+        latencies.append(time.perf_counter() - start)
+
+async def run_load(args):
+    from agents import weather_async
+    from utils.async_runtime import close_async_resources
+
+    rng = random.Random(args.seed)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        conversation(weather_async, args.turns, random.Random(rng.random()), latencies)
+        for _ in range(args.conversations)
+    ))
+    elapsed = time.perf_counter() - start
+    api_metrics = weather_async.api_latency.snapshot()
+    await close_async_resources()
+    return latencies, elapsed, api_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent conversations against the async weather stack.")
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.05, help="Stub API latency in seconds")
+    parser.add_argument('--mongomock', action='store_true',
+                        help="Use mongomock_motor instead of MONGODB_URI (reads only; the rollup "
+                             "pipeline updates and time-series inserts need a real mongod)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    server = start_stub_server(delay=args.delay)
+    os.environ['OPEN_WEATHER_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPEN_WEATHER_API', 'stub-key')
+
+    from utils.async_runtime import run_sync, set_motor_client
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        set_motor_client(AsyncMongoMockClient())
+
+    latencies, elapsed, api_metrics = run_sync(run_load(args))
+    server.shutdown()
+
+    total = len(latencies)
+    print(f"Conversations: {args.conversations}, turns: {total}")
+    print(f"Throughput: {total / elapsed:.1f} turns/s over {elapsed:.2f}s")
+    print(f"Turn latency p50: {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"Upstream API requests: {server.request_count} ({api_metrics})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/stress_server.py
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_weather_server import start_stub_server
+
+MESSAGES = [
+    "weather in london",
+    "weather in paris",
+    "hottest cities",
+    "average temperature",
+    "average humidity",
+    "list all cities in the database",
+    "show users",
+    "visibility in tokyo",
+]
+
+def post(url, body=None):
+    data = json.dumps(body or {}).encode()
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.load(response)
+
+def client(base_url, turns, rng, latencies, rejected):
+    session_id = post(f"{base_url}/sessions")['session_id']
+    for _ in range(turns):
+        start = time.perf_counter()
+        try:
+            post(f"{base_url}/sessions/{session_id}/messages", {'message': rng.choice(MESSAGES)})
+            latencies.append(time.perf_counter() - start)
+        except urllib.error.HTTPError as e:
+            if e.code not in (429, 503):
+                raise
+            rejected.append(e.code)
+            time.sleep(float(e.headers.get('Retry-After', '1')))
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the conversation server with a fake LLM backend.")
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="Fake completion latency in seconds")
+    parser.add_argument('--api-latency', type=float, default=0.02, help="Stub weather API latency in seconds")
+    parser.add_argument('--seed', type=int, default=3)
+    args = parser.parse_args()
+
+    weather_api = start_stub_server(delay=args.api_latency)
+    os.environ['OPEN_WEATHER_BASE_URL'] = weather_api.base_url
+    os.environ.setdefault('OPEN_WEATHER_API', 'stub-key')
+
+    from server import start_server
+    from utils.fake_llm import FakeLLMClient
+
+    httpd = start_server(port=0, llm_client=FakeLLMClient(latency=args.llm_latency),
+                         workers=args.workers, max_pending=args.max_pending)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    rng = random.Random(args.seed)
+    latencies, rejected = [], []
+    threads = [threading.Thread(target=client, args=(base_url, args.turns, random.Random(rng.random()),
+                                                     latencies, rejected))
+               for _ in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"Clients: {args.clients}, completed turns: {len(latencies)}, rejected: {len(rejected)}")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} turns/s over {elapsed:.2f}s")
+    print(f"Client-observed latency p50: {percentile(latencies, 0.50) * 1000:.1f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"Server stats: {json.dumps(httpd.conversations.stats())}")
+    httpd.shutdown()
+    httpd.conversations.shutdown()
+    weather_api.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/stub_weather_server.py
+
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def make_weather_payload(city_name=None, city_id=None):
+    if city_id is None:
+        city_id = zlib.crc32(city_name.lower().encode()) % 10_000_000
+    if city_name is None:
+        city_name = f"City {city_id}"
+    seed = city_id % 1000
+    return {
+        'coord': {'lon': (seed % 360) - 180.0, 'lat': (seed % 180) - 90.0},
+        'weather': [{'id': 800, 'main': 'Clear', 'description': 'clear sky', 'icon': '01d'}],
+        'base': 'stations',
+        'main': {
+            'temp': round(-10 + (seed % 450) / 10, 2),
+            'feels_like': round(-12 + (seed % 450) / 10, 2),
+            'pressure': 1000 + seed % 30,
+            'humidity': 20 + seed % 80,
+        },
+        'visibility': 10000 - (seed % 10) * 500,
+        'wind': {'speed': round((seed % 150) / 10, 1), 'deg': seed % 360},
+        'dt': int(time.time()),
+        'sys': {'country': 'ZZ', 'sunrise': 0, 'sunset': 0},
+        'id': city_id,
+        'name': city_name.title(),
+        'cod': 200,
+    }
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            throttled = server.request_count <= server.fail_first
+        if throttled:
+            self._send(429, {'cod': 429, 'message': 'Too many requests'}, {'Retry-After': '0'})
+            return
+        if server.delay:
+            time.sleep(server.delay)
+
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path.endswith('/weather'):
+            if 'id' in params:
+                self._send(200, make_weather_payload(city_id=int(params['id'])))
+            elif params.get('q'):
+                self._send(200, make_weather_payload(city_name=params['q'].split(',')[0]))
+            else:
+                self._send(400, {'cod': '400', 'message': 'Nothing to geocode'})
+        elif url.path.endswith('/group'):
+            ids = [int(i) for i in params.get('id', '').split(',') if i]
+            items = [make_weather_payload(city_id=i) for i in ids]
+            self._send(200, {'cnt': len(items), 'list': items})
+        else:
+            self._send(404, {'cod': '404', 'message': 'Not found'})
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(host='127.0.0.1', port=0, delay=0.0, fail_first=0):
+    server = ThreadingHTTPServer((host, port), StubWeatherHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.delay = delay
+    server.fail_first = fail_first
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://{host}:{server.server_address[1]}/data/2.5"
+    return server
+
+if __name__ == "__main__":
+    server = start_stub_server(port=8099)
+    print(f"Stub OpenWeatherMap server listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,49 @@
+# build_recommendations.py
+
+import argparse
+from agents.rss_recommendations import (
+    CANDIDATE_POOL_SIZE,
+    RECOMMENDATIONS_TOP_K,
+    rebuild_recommendations,
+    start_recommendation_watcher,
+    update_recommendations_from_interactions,
+)
+from utils.instrumentation import configure_logging
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the per-user RSS reading recommendations.")
+    parser.add_argument('--full', action='store_true',
+                        help="Rebuild candidate pools and rescore every user (default: only users with new interactions)")
+    parser.add_argument('--since', help="Rescore users with interactions at or after this 'YYYY-MM-DD HH:MM:SS' time")
+    parser.add_argument('--top-k', type=int, default=RECOMMENDATIONS_TOP_K, help="Recommendations kept per user")
+    parser.add_argument('--pool-size', type=int, default=CANDIDATE_POOL_SIZE,
+                        help="Candidate items kept per category and per feed")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and rescore users as their interactions and preferences change "
+                             "(needs a replica set)")
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.full:
+        summary = rebuild_recommendations(top_k=args.top_k, pool_size=args.pool_size)
+        print(f"Rebuilt recommendations for {summary['users']} users from {summary['pools']} candidate pools "
+              f"in {summary['elapsed']:.2f} seconds.")
+    else:
+        summary = update_recommendations_from_interactions(since=args.since, top_k=args.top_k)
+        print(f"Updated recommendations for {summary['users']} users with interactions since "
+              f"{summary['since'] or 'the beginning'} in {summary['elapsed']:.2f} seconds.")
+
+    if args.watch:
+        watcher = start_recommendation_watcher()
+        print("Watching interactions and preferences for changes; press Ctrl+C to stop.")
+        try:
+            while watcher.is_alive():
+                watcher.join(1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.stop()
+            print(f"Applied {watcher.events} change events.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# refresh_weather_data.py
+
+import argparse
+from agents.weather_history import downsample_weather_history, ensure_weather_history
+from agents.weather_refresh import REFRESH_WORKERS, refresh_all_cities
+from utils.db_utils import ensure_indexes, remove_duplicate_documents
+from utils.instrumentation import configure_logging
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh weather data for every tracked city.")
+    parser.add_argument('cities', nargs='*', help="City names to refresh (defaults to all tracked cities)")
+    parser.add_argument('--skip-downsample', action='store_true', help="Do not update the hourly/daily history rollups")
+    parser.add_argument('--remove-duplicates', action='store_true',
+                        help="Delete all but the newest weather document per city id before indexing")
+    parser.add_argument('--workers', type=int, default=REFRESH_WORKERS, help="Concurrent API requests")
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.remove_duplicates:
+        # One-off cleanup so the unique id index can be built on old data
+        remove_duplicate_documents('weather_data', 'id')
+    # Observations must land in the time-series collection, not an implicit one
+    ensure_indexes()
+    ensure_weather_history()
+    summary = refresh_all_cities(args.cities or None, workers=args.workers)
+    for error in summary['errors']:
+        print(f"[ERROR] {error}")
+    print(f"Refreshed {summary['written']} of {summary['requested']} cities "
+          f"in {summary['elapsed']:.2f} seconds.")
+    if not args.skip_downsample:
+        downsample_weather_history('hour')
+        downsample_weather_history('day')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# server.py
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agents.direct_response import DirectResponseSwarm
+from agents.fast_router import route_message
+from agents.router_agent import router_agent
+from utils.fake_llm import get_llm_client
+from utils.instrumentation import configure_logging, registry
+from utils.weather_client import LatencyStats
+
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '8'))
+SERVER_MAX_PENDING = int(os.getenv('SERVER_MAX_PENDING', '64'))
+SESSION_MAX_PENDING = int(os.getenv('SESSION_MAX_PENDING', '4'))
+SESSION_IDLE_TIMEOUT = float(os.getenv('SESSION_IDLE_TIMEOUT', '1800'))
+TURN_TIMEOUT = float(os.getenv('TURN_TIMEOUT', '120'))
+
+class ServerBusy(Exception):
+    pass
+
+class SessionBusy(Exception):
+    pass
+
+class Session:
+    def __init__(self, session_id, agent):
+        self.id = session_id
+        self.agent = agent
+        self.messages = []
+        self.context_variables = {}
+        self.queue = deque()
+        self.active = False
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+
+class ConversationServer:
+    def __init__(self, starting_agent, llm_client=None, workers=SERVER_WORKERS,
+                 max_pending=SERVER_MAX_PENDING, session_max_pending=SESSION_MAX_PENDING):
+        self.starting_agent = starting_agent
+        self.swarm = DirectResponseSwarm(client=llm_client)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='turn')
+        self.session_max_pending = session_max_pending
+        self.turn_latency = LatencyStats(window=10000)
+        self.rejected = 0
+        self.started = time.monotonic()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def create_session(self):
+        session = Session(uuid.uuid4().hex, self.starting_agent)
+        with self._sessions_lock:
+            self._evict_idle_sessions()
+            self._sessions[session.id] = session
+        return session.id
+
+    def _evict_idle_sessions(self):
+        cutoff = time.monotonic() - SESSION_IDLE_TIMEOUT
+        for session_id, session in list(self._sessions.items()):
+            if session.last_active < cutoff and not session.active:
+                del self._sessions[session_id]
+
+    def get_session(self, session_id):
+        with self._sessions_lock:
+            return self._sessions.get(session_id)
+
+    def submit(self, session, message):
+        # Backpressure: refuse new turns once the server-wide queue is full
+        if not self._slots.acquire(blocking=False):
+            self._count_rejected()
+            raise ServerBusy()
+        future = Future()
+        with session.lock:
+            if len(session.queue) >= self.session_max_pending:
+                self._slots.release()
+                self._count_rejected()
+                raise SessionBusy()
+            session.queue.append((message, future))
+            schedule = not session.active
+            session.active = True
+        if schedule:
+            self.pool.submit(self._drain, session)
+        return future
+
+    def _count_rejected(self):
+        # Rejections happen on request threads, so the counter shares the sessions lock
+        with self._sessions_lock:
+            self.rejected += 1
+
+    def _drain(self, session):
+        # Turns of one session run in order on a single worker; other
+        # sessions proceed in parallel on the rest of the pool
+        while True:
+            with session.lock:
+                if not session.queue:
+                    session.active = False
+                    return
+                message, future = session.queue.popleft()
+            try:
+                future.set_result(self._run_turn(session, message))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self._slots.release()
+
+    def _run_turn(self, session, message):
+        start = time.perf_counter()
+        session.messages.append({"role": "user", "content": message})
+        routed_agent = route_message(message)
+        if routed_agent is not None:
+            session.agent = routed_agent
+
+        response = self.swarm.run(
+            agent=session.agent,
+            messages=session.messages,
+            context_variables=session.context_variables,
+        )
+        session.messages.extend(response.messages)
+        session.agent = response.agent
+        session.context_variables = response.context_variables
+        session.last_active = time.monotonic()
+
+        reply = next((m.get('content') for m in reversed(response.messages)
+                      if m.get('role') == 'assistant' and m.get('content')), None)
+        elapsed = time.perf_counter() - start
+        self.turn_latency.record(elapsed)
+        return {'reply': reply, 'agent': session.agent.name, 'latency_ms': elapsed * 1000}
+
+    def stats(self):
+        latency = self.turn_latency.snapshot()
+        uptime = time.monotonic() - self.started
+        with self._sessions_lock:
+            sessions = len(self._sessions)
+            rejected = self.rejected
+        return {
+            'uptime_s': uptime,
+            'sessions': sessions,
+            'turns': latency['count'],
+            'rejected': rejected,
+            'throughput_per_s': latency['count'] / uptime if uptime else 0.0,
+            'p50_ms': latency['p50_ms'],
+            'p99_ms': latency['p99_ms'],
+            'direct_turns': self.swarm.turn_metrics()['direct']['count'],
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+MESSAGES_PATH = re.compile(r"^/sessions/(?P<session_id>[0-9a-f]+)/messages$")
+
+class ConversationHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send(200, self.server.conversations.stats())
+        elif self.path == '/metrics':
+            self._send_text(200, registry.render_prometheus(), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        conversations = self.server.conversations
+        if self.path == '/sessions':
+            self._send(201, {'session_id': conversations.create_session()})
+            return
+        match = MESSAGES_PATH.match(self.path)
+        if not match:
+            self._send(404, {'error': 'Not found'})
+            return
+        session = conversations.get_session(match.group('session_id'))
+        if session is None:
+            self._send(404, {'error': 'Unknown session'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            message = json.loads(self.rfile.read(length) or b'{}').get('message')
+        except ValueError:
+            message = None
+        if not message:
+            self._send(400, {'error': 'Expected a JSON body with a "message" field'})
+            return
+
+        try:
+            future = conversations.submit(session, message)
+        except ServerBusy:
+            self._send(503, {'error': 'Server is at capacity'}, {'Retry-After': '1'})
+            return
+        except SessionBusy:
+            self._send(429, {'error': 'Too many pending messages for this session'}, {'Retry-After': '1'})
+            return
+        try:
+            self._send(200, future.result(timeout=TURN_TIMEOUT))
+        except TimeoutError:
+            self._send(504, {'error': 'Turn timed out'})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def _send(self, status, body, headers=None):
+        self._send_text(status, json.dumps(body), 'application/json', headers)
+
+    def _send_text(self, status, body, content_type, headers=None):
+        payload = body.encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(host='127.0.0.1', port=8080, llm_client=None, **kwargs):
+    httpd = ThreadingHTTPServer((host, port), ConversationHandler)
+    httpd.daemon_threads = True
+    httpd.conversations = ConversationServer(router_agent, llm_client=llm_client, **kwargs)
+    return httpd
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve agent conversations over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('--max-pending', type=int, default=SERVER_MAX_PENDING)
+    parser.add_argument('--llm-backend', choices=['openai', 'fake'], default=os.getenv('LLM_BACKEND', 'openai'),
+                        help="Completion backend; 'fake' is deterministic and local (see FAKE_LLM_LATENCY)")
+    parser.add_argument('--skip-setup', action='store_true', help="Do not ensure indexes and rollups at startup")
+    parser.add_argument('--watch-changes', action='store_true',
+                        default=os.getenv('CHANGE_STREAMS_ENABLED', '0').lower() in ('1', 'true', 'yes'),
+                        help="Keep caches coherent with other writers through a change stream (needs a replica set)")
+    args = parser.parse_args()
+    configure_logging()
+
+    if not args.skip_setup:
+        from agents.weather_history import ensure_weather_history
+        from agents.weather_stats import ensure_city_stats
+        from utils.db_utils import ensure_indexes
+        ensure_indexes()
+        ensure_city_stats()
+        ensure_weather_history()
+
+    watcher = None
+    if args.watch_changes:
+        from agents.weather_agent import start_weather_watcher
+        watcher = start_weather_watcher()
+
+    llm_client = get_llm_client(args.llm_backend)
+    httpd = start_server(args.host, args.port, llm_client=llm_client,
+                         workers=args.workers, max_pending=args.max_pending)
+    print(f"Serving conversations on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        httpd.conversations.shutdown()
+        if watcher is not None:
+            watcher.stop()
+        print(json.dumps(httpd.conversations.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# utils/async_runtime.py
+
+import asyncio
+import os
+import threading
+
+import aiohttp
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# One event loop, one Motor client and one aiohttp session per process. Sync
+# callers submit coroutines to the loop thread with run_sync().
+_loop = None
+_loop_lock = threading.Lock()
+_motor_client = None
+_http_session = None
+
+def get_event_loop():
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='async-io', daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+def run_sync(coro, timeout=None):
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result(timeout)
+
+def set_motor_client(client):
+    # Lets load tests swap in mongomock_motor or a client for another mongod
+    global _motor_client
+    _motor_client = client
+
+async def get_motor_db():
+    global _motor_client
+    if _motor_client is None:
+        mongo_uri = os.getenv('MONGODB_URI')
+        if not mongo_uri:
+            raise Exception("MONGODB_URI is not set in the .env file.")
+        from utils.db_utils import client_options, mongo_event_listeners
+        _motor_client = AsyncIOMotorClient(mongo_uri, event_listeners=mongo_event_listeners(), **client_options())
+    return _motor_client['rss_feed_database']
+
+async def get_http_session():
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=int(os.getenv('WEATHER_API_POOL_SIZE', '100')))
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=float(os.getenv('WEATHER_API_CONNECT_TIMEOUT', '3.05')),
+            sock_read=float(os.getenv('WEATHER_API_READ_TIMEOUT', '10')),
+        )
+        _http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _http_session
+
+async def close_async_resources():
+    global _http_session, _motor_client
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+    if _motor_client is not None:
+        _motor_client.close()
+        _motor_client = None
@@ -0,0 +1,167 @@
+# utils/change_streams.py
+
+import os
+import threading
+import time
+from datetime import datetime
+from pymongo.errors import OperationFailure, PyMongoError
+from utils.db_utils import get_db
+from utils.instrumentation import get_logger, observe_span, registry
+
+logger = get_logger(__name__)
+
+# Change streams need a replica set; a single-node one is enough (see the
+# mongodb-rs service in docker-compose.yml).
+CHANGE_STREAM_STATE_COLLECTION = 'change_stream_state'
+CHANGE_STREAM_AWAIT_MS = int(os.getenv('CHANGE_STREAM_AWAIT_MS', '500'))
+CHANGE_STREAM_BATCH_SIZE = int(os.getenv('CHANGE_STREAM_BATCH_SIZE', '500'))
+CHANGE_STREAM_RETRY_SECONDS = float(os.getenv('CHANGE_STREAM_RETRY_SECONDS', '5'))
+# An idle stream's token still moves with cluster time; persist it this often
+CHANGE_STREAM_IDLE_SAVE_SECONDS = float(os.getenv('CHANGE_STREAM_IDLE_SAVE_SECONDS', '10'))
+
+# Events that end the stream or make every cached copy of the collection suspect
+RESYNC_OPERATIONS = frozenset(('invalidate', 'drop', 'rename', 'dropDatabase'))
+# CappedPositionLost, ChangeStreamFatalError, ChangeStreamHistoryLost
+RESUME_LOST_CODES = frozenset((136, 280, 286))
+
+CHANGE_LAG = registry.histogram(
+    'swarm_change_stream_lag_seconds', 'Delay between a write and its change event being applied.', ('watcher',))
+
+def enable_pre_images(*collection_names):
+    # Pre-images (MongoDB 6.0+) let delete events say which document went away
+    db = get_db()
+    for name in collection_names:
+        try:
+            db.command('collMod', name, changeStreamPreAndPostImages={'enabled': True})
+        except OperationFailure as e:
+            logger.warning("Could not enable change stream pre-images on %s: %s", name, e)
+
+class ChangeStreamWatcher(threading.Thread):
+    # Tails a change stream and hands batches of events to handler(changes).
+    # The resume token advances only after the handler returns; with persist=True
+    # it is stored so a restarted process resumes where it stopped. resync() runs
+    # when events may have been missed.
+    def __init__(self, name, collection_names, handler, resync=None, persist=False,
+                 full_document_before_change=None, batch_size=CHANGE_STREAM_BATCH_SIZE):
+        super().__init__(name=f'change-stream-{name}', daemon=True)
+        self.watcher_name = name
+        self.collection_names = tuple(collection_names)
+        self.handler = handler
+        self.resync = resync
+        self.persist = persist
+        self.full_document_before_change = full_document_before_change
+        self.batch_size = batch_size
+        self.resume_token = None
+        self.events = 0
+        self._saved_at = 0.0
+        self._stop_event = threading.Event()
+
+    def _state(self):
+        return get_db()[CHANGE_STREAM_STATE_COLLECTION]
+
+    def load_token(self):
+        document = self._state().find_one({'_id': self.watcher_name})
+        return document.get('resume_token') if document else None
+
+    def save_token(self):
+        self._state().update_one({'_id': self.watcher_name},
+                                 {'$set': {'resume_token': self.resume_token, 'updated_at': datetime.utcnow()}},
+                                 upsert=True)
+        self._saved_at = time.monotonic()
+
+    def _open(self):
+        db = get_db()
+        options = {'full_document': 'updateLookup', 'max_await_time_ms': CHANGE_STREAM_AWAIT_MS}
+        if self.full_document_before_change:
+            options['full_document_before_change'] = self.full_document_before_change
+        if self.resume_token is not None:
+            # start_after (unlike resume_after) also accepts an invalidate event's token
+            options['start_after'] = self.resume_token
+        if len(self.collection_names) == 1:
+            return db[self.collection_names[0]].watch(**options)
+        # Several collections share one database-level cursor
+        pipeline = [{'$match': {'$or': [{'ns.coll': {'$in': list(self.collection_names)}},
+                                        {'operationType': 'dropDatabase'}]}}]
+        return db.watch(pipeline, **options)
+
+    def _apply(self, changes):
+        start = time.perf_counter()
+        error = False
+        try:
+            if any(change['operationType'] in RESYNC_OPERATIONS for change in changes):
+                self._resync()
+            else:
+                self.handler(changes)
+        except Exception as e:
+            error = True
+            logger.error("Change stream %s failed to apply %s events: %s", self.watcher_name, len(changes), e)
+            # The token moves past these events, so whatever they touched is rebuilt
+            self._resync()
+        observe_span('change_stream', self.watcher_name, time.perf_counter() - start, error)
+        self.events += len(changes)
+        wall_time = changes[-1].get('wallTime')
+        if wall_time is not None:
+            now = datetime.now(wall_time.tzinfo) if wall_time.tzinfo else datetime.utcnow()
+            CHANGE_LAG.observe(max((now - wall_time).total_seconds(), 0.0), watcher=self.watcher_name)
+
+    def _resync(self):
+        if self.resync is None:
+            return
+        logger.warning("Change stream %s is resynchronizing.", self.watcher_name)
+        try:
+            self.resync()
+        except Exception as e:
+            logger.error("Change stream %s failed to resynchronize: %s", self.watcher_name, e)
+
+    def _consume(self):
+        with self._open() as stream:
+            logger.debug("Change stream %s watching %s.", self.watcher_name, ', '.join(self.collection_names))
+            while not self._stop_event.is_set() and stream.alive:
+                changes = []
+                # Drain what the server already has, then apply it as one batch
+                while len(changes) < self.batch_size:
+                    change = stream.try_next()
+                    if change is None:
+                        break
+                    changes.append(change)
+                    if change['operationType'] in RESYNC_OPERATIONS:
+                        break
+                if changes:
+                    self._apply(changes)
+                token = stream.resume_token
+                if token is None or token == self.resume_token:
+                    continue
+                self.resume_token = token
+                idle_save = time.monotonic() - self._saved_at >= CHANGE_STREAM_IDLE_SAVE_SECONDS
+                if self.persist and (changes or idle_save):
+                    self.save_token()
+
+    def run(self):
+        if self.persist:
+            try:
+                self.resume_token = self.load_token()
+            except PyMongoError as e:
+                logger.error("Could not load the resume token for %s: %s", self.watcher_name, e)
+            if self.resume_token is None:
+                # Nothing says what was already applied, so start from a clean slate
+                self._resync()
+        while not self._stop_event.is_set():
+            try:
+                self._consume()
+            except OperationFailure as e:
+                if e.code in RESUME_LOST_CODES or e.has_error_label('NonResumableChangeStreamError'):
+                    logger.warning("Change stream %s cannot resume: %s", self.watcher_name, e)
+                    self.resume_token = None
+                    self._resync()
+                else:
+                    logger.error("Change stream %s failed: %s", self.watcher_name, e)
+                    self._stop_event.wait(CHANGE_STREAM_RETRY_SECONDS)
+            except PyMongoError as e:
+                # The driver already retried once; reopen from the last token
+                logger.error("Change stream %s failed: %s", self.watcher_name, e)
+                self._stop_event.wait(CHANGE_STREAM_RETRY_SECONDS)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
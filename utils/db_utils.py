@@ -1,31 +1,365 @@
 # utils/db_utils.py
 
 import os
-from pymongo import MongoClient
+import threading
+import time
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient, UpdateOne, monitoring
+from pymongo.errors import OperationFailure
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from dotenv import load_dotenv
+from utils.instrumentation import get_logger, metrics_enabled, observe_span, registry
+
+logger = get_logger(__name__)
+
+class CommandTimer(monitoring.CommandListener):
+    # The driver already measures each command, so no per-request state is kept
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe_span('db', event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        observe_span('db', event.command_name, event.duration_micros / 1e6, error=True)
+
+POOL_CHECKOUT_WAIT = registry.histogram(
+    'mongodb_pool_checkout_wait_seconds', 'Time spent waiting to check out a pooled connection.', ('address',))
+POOL_CHECKOUT_FAILURES = registry.counter(
+    'mongodb_pool_checkout_failures_total', 'Connection checkouts that failed.', ('address', 'reason'))
+POOL_IN_USE = registry.gauge(
+    'mongodb_pool_connections_in_use', 'Connections currently checked out of the pool.', ('address',))
+POOL_OPEN = registry.gauge(
+    'mongodb_pool_connections_open', 'Connections currently open in the pool.', ('address',))
+POOL_CLEARED = registry.counter(
+    'mongodb_pool_cleared_total', 'Times the pool was cleared after a network or server error.', ('address',))
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    # Checkout runs synchronously on the calling thread, so its start time is thread-local
+    def __init__(self):
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        POOL_CLEARED.inc(address=_address(event))
+
+    def pool_closed(self, event):
+        POOL_OPEN.set(0, address=_address(event))
+        POOL_IN_USE.set(0, address=_address(event))
+
+    def connection_created(self, event):
+        POOL_OPEN.inc(address=_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_OPEN.dec(address=_address(event))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        POOL_CHECKOUT_FAILURES.inc(address=_address(event), reason=event.reason)
+        self._observe_wait(event)
+
+    def connection_checked_out(self, event):
+        POOL_IN_USE.inc(address=_address(event))
+        self._observe_wait(event)
+
+    def connection_checked_in(self, event):
+        POOL_IN_USE.dec(address=_address(event))
+
+    def _observe_wait(self, event):
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, address=_address(event))
+            self._local.started = None
+
+def mongo_event_listeners():
+    return [CommandTimer(), PoolMetrics()] if metrics_enabled() else []
 
 # Load environment variables
 load_dotenv()
 
-mongo_uri = os.getenv('MONGODB_URI')
-if not mongo_uri:
-    raise Exception("MONGODB_URI is not set in the .env file.")
+DATABASE_NAME = 'rss_feed_database'
+
+DUPLICATE_KEY_ERROR = 11000
 
-client = MongoClient(mongo_uri)
-db = client['rss_feed_database']
+# Client options read from the environment; unset variables keep the
+# driver defaults or whatever the connection string specifies
+CLIENT_OPTIONS = (
+    ('MONGODB_MAX_POOL_SIZE', 'maxPoolSize', int),
+    ('MONGODB_MIN_POOL_SIZE', 'minPoolSize', int),
+    ('MONGODB_MAX_IDLE_TIME_MS', 'maxIdleTimeMS', int),
+    ('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 'waitQueueTimeoutMS', int),
+    ('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 'serverSelectionTimeoutMS', int),
+    ('MONGODB_CONNECT_TIMEOUT_MS', 'connectTimeoutMS', int),
+    ('MONGODB_COMPRESSORS', 'compressors', str),
+    ('MONGODB_ZLIB_COMPRESSION_LEVEL', 'zlibCompressionLevel', int),
+    ('MONGODB_READ_PREFERENCE', 'readPreference', str),
+)
 
-def run_mongodb_query(collection_name, query, projection=None):
-    collection = db[collection_name]
-    results = collection.find(query, projection)
-    
-    records = list(results)
-    if not records:
+READ_PREFERENCES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+# Analytics aggregations tolerate slightly stale data, so by default they are
+# served by secondaries and stay off the primary handling interactive writes
+ANALYTICS_READ_PREFERENCE = os.getenv('MONGODB_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+ANALYTICS_MAX_STALENESS = int(os.getenv('MONGODB_ANALYTICS_MAX_STALENESS_S', '-1'))
+if ANALYTICS_READ_PREFERENCE not in READ_PREFERENCES:
+    # Fail at startup rather than on the first analytics query
+    raise ValueError(f"Invalid MONGODB_ANALYTICS_READ_PREFERENCE {ANALYTICS_READ_PREFERENCE!r}; "
+                     f"expected one of: {', '.join(READ_PREFERENCES)}")
+
+def client_options():
+    return {option: cast(os.environ[name]) for name, option, cast in CLIENT_OPTIONS if os.getenv(name)}
+
+def analytics_read_preference():
+    mode = READ_PREFERENCES[ANALYTICS_READ_PREFERENCE]
+    if mode is Primary:
+        return mode()
+    return mode(max_staleness=ANALYTICS_MAX_STALENESS)
+
+# The client is created on first use rather than at import, so importing the
+# agents costs nothing until a query runs. A forked child must not reuse the
+# parent's sockets, so the client is dropped after fork and recreated lazily.
+_client = None
+_db = None
+_analytics_db = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                mongo_uri = os.getenv('MONGODB_URI')
+                if not mongo_uri:
+                    raise Exception("MONGODB_URI is not set in the .env file.")
+                _client = MongoClient(mongo_uri, event_listeners=mongo_event_listeners(), **client_options())
+    return _client
+
+def get_db():
+    global _db
+    if _db is None:
+        # Racing callers build equivalent Database handles on the same client
+        _db = get_client()[DATABASE_NAME]
+    return _db
+
+def get_analytics_db():
+    global _analytics_db
+    if _analytics_db is None:
+        _analytics_db = get_db().with_options(read_preference=analytics_read_preference())
+    return _analytics_db
+
+def set_db(database):
+    # Lets benchmarks and tests swap in mongomock or a database on another mongod
+    global _client, _db, _analytics_db
+    with _client_lock:
+        _client = database.client
+        _db = database
+        _analytics_db = None
+
+def _reset_after_fork():
+    global _client, _db, _analytics_db, _client_lock
+    _client = None
+    _db = None
+    _analytics_db = None
+    _client_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def __getattr__(name):
+    # Keeps `db_utils.db` and `db_utils.client` working for existing callers
+    if name == 'db':
+        return get_db()
+    if name == 'client':
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+QUERY_PAGE_SIZE = int(os.getenv('MONGODB_QUERY_PAGE_SIZE', '500'))
+MAX_QUERY_ROWS = int(os.getenv('MONGODB_MAX_QUERY_ROWS', '1000'))
+MAX_QUERY_BYTES = int(os.getenv('MONGODB_MAX_QUERY_BYTES', str(64 * 1024)))
+
+# Indexes backing the lookups, sorts and joins used by the agents
+INDEXES = {
+    'weather_data': [
+        IndexModel([('id', ASCENDING)], unique=True, name='id_unique'),
+        # Also serves name_key lookups; visibility makes get_visibility a covered query
+        IndexModel([('name_key', ASCENDING), ('visibility', ASCENDING)], name='name_key_visibility'),
+        IndexModel([('main.temp', ASCENDING)], name='main_temp'),
+        IndexModel([('modified_at', ASCENDING)], name='modified_at'),
+    ],
+    'city_stats': [
+        IndexModel([('name_key', ASCENDING)], name='name_key'),
+        IndexModel([('temp_avg', ASCENDING)], name='temp_avg'),
+        IndexModel([('temp_last', ASCENDING)], name='temp_last'),
+    ],
+    'rss_items': [
+        IndexModel([('rss_feed_id', ASCENDING), ('published_date', DESCENDING)], name='feed_published'),
+    ],
+    'rss_item_categories': [
+        IndexModel([('rss_item_id', ASCENDING), ('category_id', ASCENDING)], name='item_category'),
+        IndexModel([('category_id', ASCENDING), ('rss_item_id', ASCENDING)], name='category_item'),
+    ],
+    'user_category_preferences': [
+        IndexModel([('user_id', ASCENDING), ('category_id', ASCENDING)], name='user_category'),
+        IndexModel([('category_id', ASCENDING), ('user_id', ASCENDING)], name='category_user'),
+    ],
+    'user_feed_preferences': [
+        IndexModel([('user_id', ASCENDING), ('rss_feed_id', ASCENDING)], name='user_feed'),
+        IndexModel([('rss_feed_id', ASCENDING), ('user_id', ASCENDING)], name='feed_user'),
+    ],
+    'article_interactions': [
+        IndexModel([('user_id', ASCENDING), ('interaction_time', DESCENDING)], name='user_time'),
+        IndexModel([('rss_item_id', ASCENDING), ('interaction_type', ASCENDING)], name='item_type'),
+        IndexModel([('interaction_type', ASCENDING), ('interaction_time', DESCENDING)], name='type_time'),
+        IndexModel([('interaction_time', DESCENDING)], name='interaction_time'),
+    ],
+    'feed_views': [
+        IndexModel([('rss_feed_id', ASCENDING), ('viewed_at', DESCENDING)], name='feed_viewed_at'),
+        IndexModel([('user_id', ASCENDING), ('viewed_at', DESCENDING)], name='user_viewed_at'),
+        IndexModel([('viewed_at', DESCENDING)], name='viewed_at'),
+    ],
+    'users': [
+        IndexModel([('username', ASCENDING)], name='username'),
+    ],
+    'user_recommendations': [
+        IndexModel([('items.rss_item_id', ASCENDING)], name='item'),
+        IndexModel([('updated_at', ASCENDING)], name='updated_at'),
+    ],
+    'user_sessions': [
+        IndexModel([('session_token', ASCENDING)], name='session_token'),
+        IndexModel([('user_id', ASCENDING)], name='user_id'),
+    ],
+}
+
+# Replaced by a wider index above; dropped so the planner cannot pick them
+SUPERSEDED_INDEXES = {
+    'weather_data': ['name_key'],
+}
+
+def normalize_city_name(city_name):
+    return ' '.join(city_name.lower().split())
+
+def iter_mongodb_query(collection_name, query, projection=None, page_size=QUERY_PAGE_SIZE,
+                       limit=0, skip=0, after_id=None):
+    collection = get_db()[collection_name]
+    if after_id is not None:
+        # Keyset pagination: resume after the last _id of the previous page
+        query = {'$and': [query, {'_id': {'$gt': after_id}}]}
+    cursor = collection.find(query, projection, skip=skip, limit=limit, batch_size=page_size)
+    # The context manager closes the server-side cursor if the caller stops early
+    with cursor.sort('_id', ASCENDING):
+        page = []
+        for record in cursor:
+            page.append(record)
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+def run_mongodb_query(collection_name, query, projection=None, max_rows=MAX_QUERY_ROWS,
+                      max_bytes=MAX_QUERY_BYTES):
+    parts = []
+    rows = 0
+    size = 0
+    truncated = False
+    # Ask for one extra row so we can tell the caller the output was capped
+    for page in iter_mongodb_query(collection_name, query, projection, limit=max_rows + 1):
+        for record in page:
+            if rows >= max_rows:
+                truncated = True
+                break
+            record.pop('_id', None)
+            line = str(record) + "\n"
+            if size + len(line) > max_bytes:
+                truncated = True
+                break
+            parts.append(line)
+            rows += 1
+            size += len(line)
+        if truncated:
+            break
+
+    if not parts:
         return "No results found."
-    
-    result_str = ""
-    for record in records:
-        record.pop('_id', None)
-        result_str += str(record) + "\n"
-    
-    return result_str
+    if truncated:
+        parts.append(f"... (output truncated after {rows} records)\n")
+    return "".join(parts)
+
+def backfill_name_keys(collection_name='weather_data', batch_size=1000):
+    # Computed here rather than with $toLower/$trim, which neither collapse
+    # inner whitespace nor lowercase non-ASCII letters the way lookups do
+    collection = get_db()[collection_name]
+    cursor = collection.find({'name_key': {'$exists': False}, 'name': {'$type': 'string'}}, {'name': 1})
+    operations, backfilled = [], 0
+    for document in cursor:
+        operations.append(UpdateOne({'_id': document['_id']},
+                                    {'$set': {'name_key': normalize_city_name(document['name'])}}))
+        if len(operations) >= batch_size:
+            backfilled += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        backfilled += collection.bulk_write(operations, ordered=False).modified_count
+    return backfilled
+
+def remove_duplicate_documents(collection_name, key, newest_field='modified_at'):
+    collection = get_db()[collection_name]
+    # Keep the most recently modified document for every value of key; documents
+    # without the key are not duplicates of each other and are left alone
+    pipeline = [
+        {"$match": {key: {"$ne": None}}},
+        {"$sort": {newest_field: -1}},
+        {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    stale_ids = []
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        stale_ids.extend(group['ids'][1:])
+    if not stale_ids:
+        return 0
+    removed = collection.delete_many({'_id': {'$in': stale_ids}}).deleted_count
+    logger.warning("Removed %s %s documents with a duplicate %s.", removed, collection_name, key)
+    return removed
+
+def ensure_indexes():
+    db = get_db()
+    # Documents written before name_key existed are backfilled so the index covers them
+    backfilled = backfill_name_keys('weather_data')
+    if backfilled:
+        logger.debug("Backfilled name_key on %s weather documents.", backfilled)
 
+    for collection_name, indexes in INDEXES.items():
+        try:
+            created = db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            if e.code != DUPLICATE_KEY_ERROR:
+                raise
+            # Duplicates are never deleted implicitly; the refresh CLI removes them on request
+            logger.warning("Could not build indexes on %s because of duplicate keys; "
+                           "run refresh_weather_data.py --remove-duplicates: %s", collection_name, e)
+            continue
+        logger.debug("Ensured indexes on %s: %s", collection_name, ', '.join(created))
+    for collection_name, names in SUPERSEDED_INDEXES.items():
+        existing = db[collection_name].index_information()
+        for name in names:
+            if name in existing:
+                db[collection_name].drop_index(name)
+                logger.debug("Dropped superseded index %s on %s.", name, collection_name)
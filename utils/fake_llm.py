@@ -0,0 +1,102 @@
+# utils/fake_llm.py
+
+import itertools
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall, Function
+
+# A deterministic stand-in for the OpenAI client, so the swarm loop can be
+# exercised without model latency or cost. Scripted steps are replayed first;
+# after that it calls the agent's request tool with the latest user message
+# and answers with the tool output.
+
+class FakeCompletions:
+    def __init__(self, latency=0.0, script=None):
+        self.latency = latency
+        self.calls = 0
+        self.script = list(script or [])
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create(self, model=None, messages=(), tools=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            step = self.script.pop(0) if self.script else None
+        if self.latency:
+            time.sleep(self.latency)
+        if step is not None:
+            return self._scripted(step)
+        last = messages[-1] if messages else {}
+        if last.get('role') == 'tool' and not _is_handoff(last):
+            return self._completion(ChatCompletionMessage(role='assistant', content=last.get('content')))
+
+        tool = _pick_tool(tools or [])
+        user_message = next((m.get('content') for m in reversed(messages) if m.get('role') == 'user'), '')
+        if tool is None:
+            return self._completion(ChatCompletionMessage(
+                role='assistant', content="I'm sorry, I can't help with that."))
+
+        name = tool['function']['name']
+        parameters = tool['function'].get('parameters', {})
+        arg_names = parameters.get('required') or list(parameters.get('properties', {}))
+        arguments = {arg_names[0]: user_message} if arg_names else {}
+        tool_call = ChatCompletionMessageToolCall(
+            id=f"call_{next(self._ids)}",
+            type='function',
+            function=Function(name=name, arguments=json.dumps(arguments)),
+        )
+        return self._completion(ChatCompletionMessage(role='assistant', content=None, tool_calls=[tool_call]))
+
+    def _scripted(self, step):
+        # A step is either {'content': text} or {'tool': name, 'arguments': {...}}
+        if 'tool' not in step:
+            return self._completion(ChatCompletionMessage(role='assistant', content=step.get('content')))
+        tool_call = ChatCompletionMessageToolCall(
+            id=f"call_{next(self._ids)}",
+            type='function',
+            function=Function(name=step['tool'], arguments=json.dumps(step.get('arguments', {}))),
+        )
+        return self._completion(ChatCompletionMessage(role='assistant', content=None, tool_calls=[tool_call]))
+
+    def _completion(self, message):
+        finish_reason = 'tool_calls' if message.tool_calls else 'stop'
+        return ChatCompletion(
+            id=f"fake-{next(self._ids)}",
+            choices=[Choice(finish_reason=finish_reason, index=0, message=message)],
+            created=int(time.time()),
+            model='fake-llm',
+            object='chat.completion',
+        )
+
+def _is_handoff(message):
+    # swarm reports agent transfers as a tool result of {"assistant": name}
+    try:
+        content = json.loads(message.get('content') or '')
+    except ValueError:
+        return False
+    return isinstance(content, dict) and 'assistant' in content
+
+def _pick_tool(tools):
+    for tool in tools:
+        name = tool['function']['name']
+        if name.startswith('process_') or name == 'router_process':
+            return tool
+    return None
+
+class FakeLLMClient:
+    def __init__(self, latency=0.0, script=None):
+        self.chat = SimpleNamespace(completions=FakeCompletions(latency, script))
+
+def get_llm_client(backend=None):
+    # None lets Swarm construct its default OpenAI client
+    backend = backend or os.getenv('LLM_BACKEND', 'openai')
+    if backend == 'openai':
+        return None
+    if backend == 'fake':
+        return FakeLLMClient(latency=float(os.getenv('FAKE_LLM_LATENCY', '0')))
+    raise ValueError(f"Unknown LLM backend: {backend}")
@@ -0,0 +1,161 @@
+# utils/instrumentation.py
+
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+
+# Logging is leveled and lazily formatted: callers pass %-style arguments, so
+# nothing is formatted unless the record is actually emitted.
+DEFAULT_LOG_LEVEL = 'WARNING'
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def get_logger(name):
+    return logging.getLogger(name)
+
+_metrics_enabled = None
+
+def metrics_enabled():
+    # Read on first use rather than at import, so settings in .env apply
+    # however early this module is imported
+    global _metrics_enabled
+    if _metrics_enabled is None:
+        load_dotenv()
+        _metrics_enabled = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    return _metrics_enabled
+
+def configure_logging(level=None):
+    if level is None:
+        load_dotenv()
+        level = os.getenv('LOG_LEVEL', DEFAULT_LOG_LEVEL).upper()
+    logging.basicConfig(
+        level=level,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+    )
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), count, total) for key, (counts, count, total) in self._series.items()]
+        for key, counts, count, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', _format_labels(self.labelnames, key, [('le', bound)]), cumulative
+            yield f'{self.name}_bucket', _format_labels(self.labelnames, key, [('le', '+Inf')]), count
+            yield f'{self.name}_count', _format_labels(self.labelnames, key), count
+            yield f'{self.name}_sum', _format_labels(self.labelnames, key), total
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames=labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames=labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames=labelnames, buckets=buckets)
+
+    def render_prometheus(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram(
+    'swarm_span_duration_seconds', 'Duration of instrumented operations.', ('span', 'operation'))
+SPAN_ERRORS = registry.counter(
+    'swarm_span_errors_total', 'Instrumented operations that raised.', ('span', 'operation'))
+
+def observe_span(name, operation, seconds, error=False):
+    if not metrics_enabled():
+        return
+    SPAN_SECONDS.observe(seconds, span=name, operation=operation)
+    if error:
+        SPAN_ERRORS.inc(span=name, operation=operation)
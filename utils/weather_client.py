@@ -0,0 +1,158 @@
+# utils/weather_client.py
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.instrumentation import observe_span
+
+OPEN_WEATHER_BASE_URL = os.getenv('OPEN_WEATHER_BASE_URL', 'http://api.openweathermap.org/data/2.5')
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+def backoff_delay(attempt, backoff_factor, backoff_max):
+    # Full jitter keeps a burst of failed callers from retrying in lockstep
+    return random.uniform(0, min(backoff_max, backoff_factor * 2 ** attempt))
+
+def retry_after_delay(value, backoff_max):
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(backoff_max, max(0.0, delay))
+
+class LatencyStats:
+    def __init__(self, window=1024):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.count += 1
+            self.errors += int(error)
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._samples.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, errors, total, max_latency = self.count, self.errors, self.total, self.max
+
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            'count': count,
+            'errors': errors,
+            'avg_ms': total / count * 1000 if count else 0.0,
+            'p50_ms': percentile(0.50) * 1000,
+            'p99_ms': percentile(0.99) * 1000,
+            'max_ms': max_latency * 1000,
+        }
+
+class WeatherAPIClient:
+    def __init__(self, base_url=OPEN_WEATHER_BASE_URL, connect_timeout=3.05, read_timeout=10.0,
+                 max_retries=3, backoff_factor=0.5, backoff_max=30.0, pool_size=20):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.latency = LatencyStats()
+
+        # Retries are handled here so Retry-After and jitter apply uniformly
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            base_url=os.getenv('OPEN_WEATHER_BASE_URL', OPEN_WEATHER_BASE_URL),
+            connect_timeout=float(os.getenv('WEATHER_API_CONNECT_TIMEOUT', '3.05')),
+            read_timeout=float(os.getenv('WEATHER_API_READ_TIMEOUT', '10')),
+            max_retries=int(os.getenv('WEATHER_API_MAX_RETRIES', '3')),
+            backoff_factor=float(os.getenv('WEATHER_API_BACKOFF_FACTOR', '0.5')),
+            backoff_max=float(os.getenv('WEATHER_API_BACKOFF_MAX', '30')),
+            pool_size=int(os.getenv('WEATHER_API_POOL_SIZE', '20')),
+        )
+
+    def get(self, endpoint, params):
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                elapsed = time.perf_counter() - start
+                self.latency.record(elapsed, error=True)
+                observe_span('http', endpoint, elapsed, error=True)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                retryable = response.status_code in RETRY_STATUSES
+                elapsed = time.perf_counter() - start
+                self.latency.record(elapsed, error=retryable)
+                observe_span('http', endpoint, elapsed, error=retryable)
+                if not retryable or attempt >= self.max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+            attempt += 1
+            # Pooled threads share the client; the latency lock covers this counter too
+            with self.latency._lock:
+                self.retries += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        return backoff_delay(attempt, self.backoff_factor, self.backoff_max)
+
+    def _retry_after(self, response):
+        return retry_after_delay(response.headers.get('Retry-After'), self.backoff_max)
+
+    def metrics(self):
+        stats = self.latency.snapshot()
+        with self.latency._lock:
+            stats['retries'] = self.retries
+        return stats
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_weather_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeatherAPIClient.from_env()
+    return _client